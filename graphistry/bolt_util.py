@@ -1,3 +1,4 @@
+import numpy as np
 from .pygraphistry import util
 
 node_id_key = u'_bolt_node_id_key'
@@ -17,32 +18,170 @@ def to_bolt_driver(driver):
     except ImportError:
         raise BoltSupportModuleNotFound()
 
-def bolt_graph_to_edges_dataframe(graph):
-    import pandas as pd
-    return pd.DataFrame([
-        util.merge_two_dicts(
-            { key: value for (key, value) in relationship.items() },
-            {
-                relationship_id_key:    relationship.id,
-                start_node_id_key:          relationship.start_node.id,
-                end_node_id_key:     relationship.end_node.id
-            }
-        )
-        for relationship in graph.relationships
-    ])
+def bolt_graph_to_edges_dataframe(graph, sparse=False):
+    edges = ColumnarBuilder(sparse)
+    for relationship in graph.relationships:
+        edges.append(relationship_items(relationship))
+    return edges.to_dataframe()
+
+
+def bolt_graph_to_nodes_dataframe(graph, sparse=False):
+    nodes = ColumnarBuilder(sparse)
+    for node in graph.nodes:
+        nodes.append(node_items(node))
+    return nodes.to_dataframe()
+
+
+# Stream the records of a query result into (edges, nodes) dataframes, without first building
+# the whole result graph. Nodes, relationships and paths are found anywhere in the records,
+# including in lists and maps (eg. RETURN {n: n}), and are kept once per id. Nodes only seen as relationship endpoints get
+# a row with just their id. With sparse, properties missing from some rows are stored as sparse columns.
+def bolt_records_to_dataframes(records, sparse=False):
+    edges = ColumnarBuilder(sparse)
+    nodes = ColumnarBuilder(sparse)
+    node_ids = set()
+    relationship_ids = set()
+    endpoint_ids = []
+
+    def add(value):
+        if is_path(value):
+            for node in value.nodes:
+                add(node)
+            for relationship in value.relationships:
+                add(relationship)
+        elif is_relationship(value):
+            if value.id not in relationship_ids:
+                relationship_ids.add(value.id)
+                edges.append(relationship_items(value))
+                endpoint_ids.extend([value.start_node.id, value.end_node.id])
+        elif is_node(value):
+            if value.id not in node_ids:
+                node_ids.add(value.id)
+                nodes.append(node_items(value))
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                add(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                add(item)
 
+    for record in records:
+        for value in record:
+            add(value)
+    for node_id in endpoint_ids:
+        if node_id not in node_ids:
+            node_ids.add(node_id)
+            nodes.append([(node_id_key, node_id)])
+    return (edges.to_dataframe(), nodes.to_dataframe())
 
-def bolt_graph_to_nodes_dataframe(graph):
+
+def run_query(driver, query, params, sparse=False):
+    with driver.session() as session:
+        return bolt_records_to_dataframes(session.run(query, **params), sparse)
+
+
+# Run a query once per partition, each on its own session of the driver's pool, and merge the
+# (edges, nodes) results. The query selects its share of the data with the 'partition' (in
+# [0, partitions - 1]) and 'partitions' parameters, eg. WHERE id(n) % $partitions = $partition.
+def run_partitioned_query(driver, query, params, partitions, sparse=False):
+    from concurrent.futures import ThreadPoolExecutor
+    runs = [util.merge_two_dicts(params, {'partition': i, 'partitions': partitions}) for i in range(partitions)]
+    with ThreadPoolExecutor(max_workers=partitions) as executor:
+        results = list(executor.map(lambda run_params: run_query(driver, query, run_params, sparse), runs))
+    edges = concat_unique([e for (e, _) in results], relationship_id_key)
+    nodes = concat_unique([n for (_, n) in results], node_id_key)
+    return (edges, nodes)
+
+
+# Concatenate dataframes, keeping one row per key. When partitions returned the same node,
+# eg. once with its properties and once as a bare relationship endpoint, the rows are merged.
+def concat_unique(dfs, key):
     import pandas as pd
-    return pd.DataFrame([
-        util.merge_two_dicts(
-            { key: value for (key, value) in node.items() },
-            {
-                node_id_key: node.id
-            }
-        )
-        for node in graph.nodes
-    ])
+    df = pd.concat(dfs, ignore_index=True)
+    if key not in df.columns or not df[key].duplicated().any():
+        return df
+    return df.groupby(key, sort=False).first().reset_index()[df.columns]
+
+
+# Duck-typed checks, so that any version of the neo4j driver (or a test double) works
+def is_path(value):
+    return hasattr(value, 'relationships') and hasattr(value, 'nodes')
+
+def is_relationship(value):
+    return hasattr(value, 'start_node') and hasattr(value, 'end_node')
+
+def is_node(value):
+    return hasattr(value, 'labels') and hasattr(value, 'id')
+
+
+def node_items(node):
+    return list(node.items()) + [(node_id_key, node.id)]
+
+def relationship_items(relationship):
+    return list(relationship.items()) + [
+        (relationship_id_key, relationship.id),
+        (start_node_id_key, relationship.start_node.id),
+        (end_node_id_key, relationship.end_node.id)
+    ]
+
+
+# Accumulates rows of (key, value) items column by column. Each column only stores the rows
+# where it has a value, so rows holding few of the keys cost little. With sparse, the columns
+# missing from some rows stay that way in the dataframe: they become pandas sparse columns,
+# which only store their values, and that vgraph encodes without padding (see vgraph.py).
+class ColumnarBuilder(object):
+
+    def __init__(self, sparse=False):
+        self.sparse = sparse
+        self.count = 0
+        self._columns = {}
+        self._names = []
+
+    def append(self, items):
+        row = self.count
+        for (key, value) in items:
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = ([], [])
+                self._names.append(key)
+            column[0].append(row)
+            column[1].append(value)
+        self.count += 1
+
+    # Columns appear in the order of their first value, as when building a dataframe from
+    # one dict per row. Rows without a value for a column hold NaN.
+    def to_dataframe(self):
+        import pandas as pd
+        data = {}
+        for name in self._names:
+            (rows, values) = self._columns[name]
+            if len(rows) == self.count:
+                data[name] = pd.Series(values)
+            elif self.sparse:
+                data[name] = self._sparse_column(rows, values)
+            else:
+                data[name] = pd.Series(values, index=rows).reindex(pd.RangeIndex(self.count))
+        return pd.DataFrame(data, columns=self._names)
+
+    # Sparse column holding values at rows, built without materializing the dense column.
+    # Missing rows read as NaN, so integers become floats and booleans objects, as in a reindex.
+    def _sparse_column(self, rows, values):
+        import pandas as pd
+        from pandas._libs.sparse import IntIndex
+        values = pd.Series(values)
+        dtype = values.dtype
+        if dtype.kind in 'iu':
+            dtype = np.dtype('float64')
+        elif dtype.kind not in 'fcO':
+            dtype = np.dtype('object')
+        present = values.notna().values
+        positions = np.asarray(rows, dtype=np.int32)[present]
+        array = pd.arrays.SparseArray(
+            values.values[present].astype(dtype),
+            sparse_index=IntIndex(self.count, positions),
+            dtype=pd.SparseDtype(dtype, np.nan))
+        return pd.Series(array)
+
 
 class BoltSupportModuleNotFound(Exception):
     def __init__(self):
@@ -0,0 +1,181 @@
+from __future__ import absolute_import
+from builtins import object
+
+import collections
+import datetime
+import decimal
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+
+# Persistent key/value store keeping one JSON file per entry in a directory.
+# Entries expire after max_age seconds, and the oldest ones are evicted once
+# there are more than max_entries.
+class DiskCache(object):
+
+    suffix = '.json'
+    tmp_suffix = '.tmp'
+
+    # Seconds after which a temporary file is left over by an interrupted put(), rather
+    # than being written by a concurrent one.
+    tmp_max_age = 60
+
+    def __init__(self, path, max_entries, max_age):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if time.time() - entry['created'] > self.max_age:
+            self._remove(entry_path)
+            return None
+        return entry['value']
+
+    def put(self, key, value):
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # Write then rename, so that concurrent readers never see partial entries.
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.path, suffix=DiskCache.tmp_suffix)
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump({'created': time.time(), 'value': value}, tmp_file)
+        getattr(os, 'replace', os.rename)(tmp_path, self._entry_path(key))
+        self.evict()
+
+    # Remove expired entries and leftover temporary files, then the oldest entries beyond max_entries.
+    def evict(self):
+        try:
+            names = [name for name in os.listdir(self.path)
+                     if name.endswith(DiskCache.suffix) or name.endswith(DiskCache.tmp_suffix)]
+        except OSError:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            entry_path = os.path.join(self.path, name)
+            try:
+                mtime = os.path.getmtime(entry_path)
+            except OSError:
+                continue
+            if name.endswith(DiskCache.tmp_suffix):
+                if now - mtime > DiskCache.tmp_max_age:
+                    self._remove(entry_path)
+            elif now - mtime > self.max_age:
+                self._remove(entry_path)
+            else:
+                entries.append((mtime, entry_path))
+        entries.sort()
+        for (_, entry_path) in entries[:max(0, len(entries) - self.max_entries)]:
+            self._remove(entry_path)
+
+    def clear(self):
+        for name in os.listdir(self.path) if os.path.isdir(self.path) else []:
+            if name.endswith(DiskCache.suffix) or name.endswith(DiskCache.tmp_suffix):
+                self._remove(os.path.join(self.path, name))
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + DiskCache.suffix)
+
+    def _remove(self, entry_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+
+# Fast content hash of a dataframe: column names, dtypes and a vectorized hash of every row.
+# Returns None when the dataframe cannot be hashed (eg. cells holding lists or dicts).
+def frame_digest(df):
+    import pandas
+    try:
+        row_hashes = pandas.util.hash_pandas_object(df, index=False).values
+    except (AttributeError, TypeError):
+        return None
+    h = hashlib.sha1()
+    h.update(json.dumps([str(c) for c in df.columns]).encode('utf8'))
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode('utf8'))
+    h.update(row_hashes.tobytes())
+    return h.hexdigest()
+
+
+# Combine JSON-serializable parts into one hexadecimal key. Parts may also hold numpy and
+# pandas values (eg. arrays or Series), as well as dates, times, decimals and UUIDs. Returns
+# None when they hold anything else, which has no exact JSON form.
+def digest(parts):
+    try:
+        encoded = json.dumps(parts, sort_keys=True, default=json_value)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha1(encoded.encode('utf8')).hexdigest()
+
+
+def json_value(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta, decimal.Decimal, uuid.UUID)):
+        return {type(value).__name__: str(value)}
+    raise TypeError('%s has no exact JSON form' % type(value).__name__)
+
+
+# In-memory cache of values expiring after max_age seconds. Once the values take more than
+# max_size (as measured by the caller), the least recently used ones are evicted. Values are
+# stored along with objects (eg. a database driver), and only hit for the very same objects.
+class MemoryCache(object):
+
+    def __init__(self, max_size, max_age):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, objects):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            (sources, value, size, created) = entry
+            if time.time() - created > self.max_age:
+                self.size -= size
+                return None
+            self._entries[key] = entry
+            if len(sources) != len(objects) or any(a is not b for (a, b) in zip(sources, objects)):
+                return None
+            return value
+
+    def put(self, key, objects, value, size):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            if size > self.max_size:
+                return
+            now = time.time()
+            for (expired_key, expired) in list(self._entries.items()):
+                if now - expired[3] > self.max_age:
+                    del self._entries[expired_key]
+                    self.size -= expired[2]
+            self._entries[key] = (list(objects), value, size, now)
+            self.size += size
+            while self.size > self.max_size:
+                (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
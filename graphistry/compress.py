@@ -0,0 +1,172 @@
+from __future__ import division
+from builtins import range
+from builtins import next
+from past.builtins import basestring
+
+import collections
+import struct
+import sys
+import time
+import zlib
+
+
+# Compression level used when the configured level is 'auto' and the payload is too
+# small for the choice to matter.
+default_level = 6
+
+# Levels considered by 'auto', from fastest to smallest.
+auto_levels = [1, 3, 6, 9]
+
+# Payloads under this size (in bytes) are compressed with the default level.
+auto_min_size = 1024 * 1024
+
+# Amount of payload (in bytes) compressed at each candidate level to estimate its speed and ratio.
+auto_sample_size = 256 * 1024
+
+# Upload bandwidth (in bytes/s) assumed until an upload has been measured.
+assumed_bandwidth = 10 * 1024 * 1024
+
+
+# Validate a compression level setting, which may come as a string from the environment.
+def check_level(level):
+    if isinstance(level, basestring) and level.isdigit():
+        level = int(level)
+    if level == 'auto' or (isinstance(level, int) and level in range(0, 10)):
+        return level
+    raise ValueError('Compression level must be an integer between 0 and 9, or "auto" (got %s)' % level)
+
+
+def check_threads(threads):
+    if isinstance(threads, basestring) and threads.isdigit():
+        threads = int(threads)
+    if isinstance(threads, int) and threads >= 1:
+        return threads
+    raise ValueError('Number of compression threads must be a positive integer (got %s)' % threads)
+
+
+# Resolve the configured compression level (0-9 or 'auto') for a payload of the given
+# raw size. In 'auto' mode, every candidate level compresses the sample, and the level
+# minimizing the estimated compression time plus upload time is picked. As both times are
+# proportional to the size, a lower bound of at least auto_min_size picks the same level.
+def resolve_level(level, size, sample, bandwidth=None):
+    if level != 'auto':
+        return level
+    if size < auto_min_size or len(sample) == 0:
+        return default_level
+
+    bandwidth = bandwidth or assumed_bandwidth
+    def estimated_time(candidate):
+        start = time.time()
+        compressed_size = len(zlib.compress(sample, candidate))
+        elapsed = max(time.time() - start, 1e-6)
+        compress_time = size * elapsed / len(sample)
+        upload_time = size * compressed_size / len(sample) / bandwidth
+        return compress_time + upload_time
+    return min(auto_levels, key=estimated_time)
+
+
+# Returns the first bytes of a payload given as a sequence of chunks.
+def sample(chunks, size=auto_sample_size):
+    pieces = []
+    remaining = size
+    for chunk in chunks:
+        pieces.append(chunk[:remaining])
+        remaining -= len(pieces[-1])
+        if remaining <= 0:
+            break
+    return b''.join(pieces)
+
+
+# Consume the first chunks of a payload, up to at least size bytes, and return them.
+def head(chunks, size):
+    pieces = []
+    remaining = size
+    for chunk in chunks:
+        pieces.append(chunk)
+        remaining -= len(chunk)
+        if remaining <= 0:
+            break
+    return pieces
+
+
+# Exponential moving average of the observed upload bandwidth, in bytes/s.
+def update_bandwidth(previous, size, elapsed):
+    if elapsed <= 0 or size == 0:
+        return previous
+    observed = size / elapsed
+    return observed if previous is None else 0.5 * previous + 0.5 * observed
+
+
+# Block size (in bytes) of the parallel compressor. Each block is compressed independently.
+parallel_block_size = 1024 * 1024
+
+# The deflate window: each block is primed with this many trailing bytes of the previous
+# one, so splitting the payload into blocks barely affects the compression ratio.
+window_size = 32 * 1024
+
+
+# Split a payload given as a sequence of chunks into blocks of block_size bytes.
+def blocks(chunks, block_size):
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        offset = 0
+        while offset < len(chunk):
+            piece = chunk[offset:offset + block_size - pending_size]
+            offset += len(piece)
+            pending.append(piece)
+            pending_size += len(piece)
+            if pending_size == block_size:
+                yield b''.join(pending)
+                pending = []
+                pending_size = 0
+    if pending_size > 0:
+        yield b''.join(pending)
+
+
+# Compress one block as a piece of a raw deflate stream. Only the last block terminates
+# the stream: the others end on a byte boundary (sync flush), so blocks can be concatenated.
+def deflate_block(block, level, dictionary, last):
+    if dictionary and sys.version_info >= (3, 3):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        # Python 2 has no preset dictionaries, which only costs a little compression ratio
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+# Write a payload given as a sequence of chunks to out_file as a single gzip stream, compressing
+# blocks on a pool of threads (zlib releases the GIL) in the manner of pigz. The output can be
+# read by any gzip decoder.
+def parallel_gzip(chunks, out_file, level, threads, block_size=None):
+    from concurrent.futures import ThreadPoolExecutor
+    block_size = block_size or parallel_block_size
+
+    xfl = 2 if level == 9 else 4 if level == 1 else 0
+    out_file.write(b'\x1f\x8b\x08\x00' + struct.pack('<I', int(time.time())) + struct.pack('<BB', xfl, 255))
+
+    crc = 0
+    size = 0
+    in_flight = collections.deque()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        previous = b''
+        # Look one block ahead to know which block is the last one.
+        block_iter = blocks(chunks, block_size)
+        block = next(block_iter, None)
+        while block is not None:
+            following = next(block_iter, None)
+            in_flight.append(executor.submit(deflate_block, block, level, previous[-window_size:],
+                                             following is None))
+            crc = zlib.crc32(block, crc) & 0xffffffff
+            size += len(block)
+            previous = block
+            block = following
+            # Bound memory by writing out finished blocks once enough are queued.
+            while len(in_flight) > 2 * threads:
+                out_file.write(in_flight.popleft().result())
+        while in_flight:
+            out_file.write(in_flight.popleft().result())
+
+    if size == 0:
+        out_file.write(zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS).flush())
+    out_file.write(struct.pack('<II', crc, size & 0xffffffff))
@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
 import sys
 
+from . import util
+
 ### COMMON TO HYPERGRAPH AND SIMPLE GRAPH
 def makeDefs(DEFS, opts={}):
     defs = {key: opts[key] if key in opts else DEFS[key] for key in DEFS}    
@@ -46,20 +49,63 @@ def valToSafeStr (v):
             return repr(v)        
 
 
+# Columnar valToSafeStr: the values of a series, converted to python objects as row-wise
+# access would (eg. numpy.int64 -> int), then rendered as strings. Numpy renders integers,
+# booleans and doubles as repr() does, and columns of strings are kept as is. Only mixed
+# objects are rendered value by value, as equal values of different types (eg. True, 1 and
+# 1.0) render differently, and other columns (eg. float32, dates) once per distinct value.
+def valsToSafeStrs(series):
+    if series.dtype.kind in 'iub' or series.dtype == np.float64:
+        return series.astype(str)
+    if series.dtype == object:
+        if pd.api.types.infer_dtype(series, skipna=False) in ('string', 'unicode'):
+            return series.copy()
+        return series.map(valToSafeStr)
+    (codes, uniques) = pd.factorize(series)
+    rendered = pd.Series(uniques).astype(object).map(valToSafeStr).values
+    strs = rendered.take(codes, mode='clip') if len(rendered) else np.empty(len(codes), dtype=object)
+    missing = codes == -1
+    if missing.any():
+        strs[missing] = series[missing].astype(object).map(valToSafeStr).values
+    return pd.Series(strs, index=series.index, dtype=object)
+
+
+# Distinct values of an entity column and their string representations, minus the values
+# in seen (a pd.Index of values already turned into entities)
+def entity_values(column, drop_na, seen=None):
+    vals = pd.Series(np.asarray(column.unique()))
+    if seen is not None:
+        vals = vals[~vals.isin(seen).values].reset_index(drop=True)
+    strs = valsToSafeStrs(vals)
+    if drop_na:
+        vals = vals[(strs != 'nan').values]
+        strs = strs[(strs != 'nan').values]
+    return (vals, strs)
+
 #ex output: pd.DataFrame([{'val::state': 'CA', 'nodeType': 'state', 'nodeID': 'state::CA'}])
-def format_entities(events, entity_types, defs, drop_na):
+# The entities of each column are given as (column, values, string representations)
+def entities_frame(column_values, defs):
     cat_lookup = make_reverse_lookup(defs['CATEGORIES'])
-    lst = sum([[{
-                    col: v,
-                    defs['TITLE']: v,
-                    defs['NODETYPE']: col, 
-                    defs['NODEID']: col2cat(cat_lookup, col) + defs['DELIM'] + valToSafeStr(v)
-                } 
-                for v in events[col].unique() if not drop_na or valToSafeStr(v) != 'nan'] for col in entity_types], [])
-    df = pd.DataFrame(lst)
-    df[defs['CATEGORY']] = df[defs['NODETYPE']].apply(lambda col: col2cat(cat_lookup, col))
+    subframes = []
+    titles = []
+    for (col, vals, strs) in column_values:
+        subframes.append(pd.DataFrame({
+            col: vals,
+            defs['NODETYPE']: col,
+            defs['NODEID']: col2cat(cat_lookup, col) + defs['DELIM'] + strs
+        }, columns=[col, defs['NODETYPE'], defs['NODEID']]))
+        titles.append(vals.astype(object).values)
+    if not len(subframes):
+        return pd.DataFrame([])
+    df = pd.concat(subframes, ignore_index=True)
+    # Titles mix values of all the columns, so infer their common type from the values themselves
+    df.insert(1, defs['TITLE'], pd.Series(np.concatenate(titles)).infer_objects())
+    df[defs['CATEGORY']] = df[defs['NODETYPE']].map(lambda col: col2cat(cat_lookup, col))
     return df
 
+def format_entities(events, entity_types, defs, drop_na):
+    return entities_frame([(col,) + entity_values(events[col], drop_na) for col in entity_types], defs)
+
 DEFS_HYPER = {
     'TITLE': 'nodeTitle',
     'DELIM': '::',
@@ -69,38 +115,74 @@ DEFS_HYPER = {
     'CATEGORY': 'category',
     'NODETYPE': 'type',
     'EDGETYPE': 'edgeType',
+    'STRINGID': 'nodeStringID',
     'SKIP': [],
     'CATEGORIES': {} # { 'categoryName': ['colName', ...], ... }
 }
 
 
 
-#ex output: pd.DataFrame([{'edgeType': 'state', 'attribID': 'state::CA', 'eventID': 'eventID::0'}])
-def format_hyperedges(events, entity_types, defs, drop_na, drop_edge_attrs):
+# Edges of each entity column, as {column: pd.DataFrame}, leaving out columns without edges.
+# With normalize_edges, edges are the ones made when keeping event attributes, minus these
+# attributes: they are only stored once, on the event nodes, which edges reference by EventID.
+def hyperedge_subframes(events, entity_types, defs, drop_na, drop_edge_attrs, normalize_edges=False,
+                        complete_rows=None):
+    if normalize_edges:
+        drop_edge_attrs = True
+    if drop_na and complete_rows is None and (normalize_edges or not drop_edge_attrs):
+        complete_rows = format_complete_rows(events)
+
+    subframes = {}
+    for col in entity_types:
+        rows = edge_rows(events, col, defs, drop_na, complete_rows)
+        edges = edge_frame(events, col, rows, attrib_ids(events, col, rows, defs), defs, drop_edge_attrs)
+        if edges is not None:
+            subframes[col] = edges
+    return subframes
+
+# Rows that keep their edges when edges carry every event attribute
+def format_complete_rows(events):
+    return events.notnull().all(axis=1).values
+
+# Mask of the events with an edge to an entity of column col, or None for all of them. Without
+# complete_rows (ie. when dropping edge attributes), only the events missing col have none.
+def edge_rows(events, col, defs, drop_na, complete_rows):
+    if not drop_na:
+        return None
+    if complete_rows is not None:
+        return complete_rows
+    return events[list(set([defs['EVENTID'], col]))].notnull().all(axis=1).values
+
+# Attribute ids of the edges of column col, given the rows of its edges
+def attrib_ids(events, col, rows, defs):
+    values = events[col] if rows is None else events[col][rows]
+    return col2cat(make_reverse_lookup(defs['CATEGORIES']), col) + defs['DELIM'] + valsToSafeStrs(values)
+
+# Edges of column col, given the rows of its edges and their attribute ids, or None without edges
+def edge_frame(events, col, rows, attribs, defs, drop_edge_attrs):
     is_using_categories = len(defs['CATEGORIES'].keys()) > 0
     cat_lookup = make_reverse_lookup(defs['CATEGORIES'])
+    fields = list(set([defs['EVENTID']] + ([x for x in events.columns] if not drop_edge_attrs else [col])))
+    raw = events[ fields ]
+    raw = raw.copy() if rows is None else raw[rows]
+    if not len(raw):
+        return None
+    if is_using_categories:
+        raw[defs['EDGETYPE']] = col2cat(cat_lookup, col)
+        raw[defs['CATEGORY']] = col
+    else:
+        raw[defs['EDGETYPE']] = col
+    raw[defs['ATTRIBID']] = attribs.values if isinstance(attribs, pd.Series) else attribs
+    if drop_edge_attrs:
+        raw = raw.drop([col], axis=1)
+    return raw
 
-    subframes = []
-    for col in sorted(entity_types):
-        fields = list(set([defs['EVENTID']] + ([x for x in events.columns] if not drop_edge_attrs else [col])))
-        raw = events[ fields ]
-        if drop_na:
-            raw = raw.dropna()
-        raw = raw.copy()
-        if len(raw):            
-            if is_using_categories:
-                raw[defs['EDGETYPE']] = raw.apply(lambda r: col2cat(cat_lookup, col), axis=1)
-                raw[defs['CATEGORY']] = raw.apply(lambda r: col, axis=1)
-            else:
-                raw[defs['EDGETYPE']] = raw.apply(lambda r: col, axis=1)
-            raw[defs['ATTRIBID']] = raw.apply(lambda r: col2cat(cat_lookup, col) + defs['DELIM'] + valToSafeStr(r[col]), axis=1)
-            if drop_edge_attrs:
-                raw = raw.drop([col], axis=1)
-            subframes.append(raw)
-
+#ex output: pd.DataFrame([{'edgeType': 'state', 'attribID': 'state::CA', 'eventID': 'eventID::0'}])
+def hyperedges_frame(subframes, event_columns, defs, drop_edge_attrs):
+    is_using_categories = len(defs['CATEGORIES'].keys()) > 0
     if len(subframes):
         result_cols = list(set(
-            ([x for x in events.columns.tolist() if not x == defs['NODETYPE']] 
+            ([x for x in event_columns if not x == defs['NODETYPE']] 
                 if not drop_edge_attrs 
                 else [])
             + [defs['EDGETYPE'], defs['ATTRIBID'], defs['EVENTID']]
@@ -110,6 +192,29 @@ def format_hyperedges(events, entity_types, defs, drop_na, drop_edge_attrs):
     else:
         return pd.DataFrame([])
 
+def format_hyperedges(events, entity_types, defs, drop_na, drop_edge_attrs, normalize_edges=False):
+    subframes = hyperedge_subframes(events, entity_types, defs, drop_na, drop_edge_attrs, normalize_edges)
+    return hyperedges_frame([subframes[col] for col in sorted(subframes)], events.columns.tolist(), defs,
+                            drop_edge_attrs or normalize_edges)
+
+#ex output: pd.Series(['EventID::0', 'EventID::1', ...])
+# Ids are the EVENTID column if any, or else the row numbers, starting at offset. Values are
+# rendered as they would be when read row-wise: in the dtype common to all the columns (eg.
+# ints as floats when every other column is a float).
+def format_eventids(events, defs, offset=0):
+    if defs['EVENTID'] in events.columns:
+        ids = events[defs['EVENTID']]
+        row_dtype = events.head(1).values.dtype
+    else:
+        ids = pd.Series(np.arange(offset, offset + len(events)), index=events.index)
+        row_dtype = events.head(1).reset_index().values.dtype
+    if row_dtype != object:
+        ids = ids.astype(row_dtype)
+    prefix = defs['EVENTID'] + defs['DELIM']
+    if ids.dtype.kind in 'iu':
+        return prefix + ids.astype(str)
+    return prefix + valsToSafeStrs(ids)
+
 def format_hypernodes(events, defs, drop_na):
     event_nodes = events.copy()
     event_nodes[defs['NODETYPE']] = defs['EVENTID']
@@ -118,41 +223,175 @@ def format_hypernodes(events, defs, drop_na):
     event_nodes[defs['TITLE']] = event_nodes[defs['EVENTID']]    
     return event_nodes
 
-def hyperbinding(g, defs, entities, event_entities, edges):
+# Number nodes 0..#nodes-1 in order of first appearance in the edges, dropping nodes without
+# edges, and use these numbers as node ids in both nodes and edges. String ids are kept in
+# the STRINGID column.
+def format_integer_ids(edges, nodes, defs):
+    (codes, ids) = pd.factorize(pd.concat([edges[defs['ATTRIBID']], edges[defs['EVENTID']]], ignore_index=True))
+    nodes = nodes.drop_duplicates(subset=[defs['NODEID']]).set_index(defs['NODEID']).reindex(ids).reset_index(drop=True)
+    nodes[defs['STRINGID']] = ids
+    nodes[defs['NODEID']] = np.arange(len(ids))
+    edges = edges.copy()
+    edges[defs['ATTRIBID']] = codes[:len(edges)]
+    edges[defs['EVENTID']] = codes[len(edges):]
+    return (edges, nodes)
+
+def hyperbinding(g, defs, entities, event_entities, edges, integer_ids=False):
     nodes = pd.concat([entities, event_entities], ignore_index=True).reset_index(drop=True)
+    if integer_ids:
+        (edges, nodes) = format_integer_ids(edges, nodes, defs)
+    graph = g\
+        .bind(source=defs['ATTRIBID'], destination=defs['EVENTID']).edges(edges)\
+        .bind(node=defs['NODEID'], point_title=defs['TITLE']).nodes(nodes)
     return {
         'entities': entities,
         'events': event_entities,
         'edges': edges,
         'nodes': nodes,
-        'graph': g\
-            .bind(source=defs['ATTRIBID'], destination=defs['EVENTID']).edges(edges)\
-            .bind(node=defs['NODEID'], point_title=defs['TITLE']).nodes(nodes)
+        'graph': graph._with_dense_ids() if integer_ids else graph
     }    
 
 ###########        
 
-class Hypergraph(object):        
+# Builds a hypergraph out of events added in chunks, eg. from pd.read_csv(..., chunksize=...).
+# Each chunk is turned into event nodes and edges as it arrives, and only the values not seen
+# in previous chunks become entities. The result is the same as for all the events at once,
+# provided that chunks have the same columns and dtypes.
+class HypergraphBuilder(object):
 
-    @staticmethod
-    def hypergraph(g, raw_events, entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False, verbose=True):
-        defs = makeDefs(DEFS_HYPER, opts)
-        entity_types = screen_entities(raw_events, entity_types, defs)
-        events = raw_events.copy().reset_index(drop=True)
-        if defs['EVENTID'] in events.columns:
-            events[defs['EVENTID']] = events.apply(
-                lambda r: defs['EVENTID'] + defs['DELIM'] + valToSafeStr(r[defs['EVENTID']]), 
-                axis=1)
-        else:
-            events[defs['EVENTID']] = events.reset_index().apply(
-                lambda r: defs['EVENTID'] + defs['DELIM'] + valToSafeStr(r['index']),
-                axis=1)
+    def __init__(self, g, entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False,
+                 normalize_edges=False, integer_ids=False, workers=None):
+        self.g = g
+        self.defs = makeDefs(DEFS_HYPER, opts)
+        self.entity_types = entity_types
+        self.drop_na = drop_na
+        self.drop_edge_attrs = drop_edge_attrs
+        self.normalize_edges = normalize_edges
+        self.integer_ids = integer_ids
+        self.workers = workers or 1
+        self.event_count = 0
+        self._event_columns = None
+        self._seen = {}
+        self._entity_values = {}
+        self._event_nodes = []
+        self._edges = {}
+        self._incomplete_events = 0
+
+    def add(self, raw_events):
+        defs = self.defs
+        if self._event_columns is None:
+            self.entity_types = screen_entities(raw_events, self.entity_types, defs)
+        events = raw_events.reset_index(drop=True)
+        events[defs['EVENTID']] = format_eventids(events, defs, self.event_count)
         events[defs['NODETYPE']] = 'event'
-        entities = format_entities(events, entity_types, defs, drop_na)
-        event_entities = format_hypernodes(events, defs, drop_na)
-        edges = format_hyperedges(events, entity_types, defs, drop_na, drop_edge_attrs)
+        self._event_columns = events.columns.tolist()
+
+        for (col, ((vals, strs), edges)) in zip(self.entity_types, self._map_columns(events)):
+            self._seen[col] = pd.Index(vals) if col not in self._seen else self._seen[col].append(pd.Index(vals))
+            self._entity_values.setdefault(col, []).append((vals, strs))
+            if edges is not None:
+                self._edges.setdefault(col, []).append(edges)
+        self._event_nodes.append(format_hypernodes(events, defs, self.drop_na))
+        self.event_count += len(events)
+        return self
+
+    # (entity values, edges) of each entity column. With several workers, columns are spread
+    # over processes forked for the chunk, which inherit the events instead of receiving copies.
+    # They return the attribute ids of the edges as codes into the distinct ids, from which
+    # the edges are rebuilt here, as sending back edges would copy the events again.
+    def _map_columns(self, events):
+        global _worker_state
+        drop_edge_attrs = self.drop_edge_attrs or self.normalize_edges
+        complete_rows = format_complete_rows(events) \
+            if self.drop_na and (self.normalize_edges or not self.drop_edge_attrs) else None
+        if complete_rows is not None and self.normalize_edges:
+            self._incomplete_events += len(complete_rows) - int(complete_rows.sum())
+        state = (events, self.defs, self.drop_na, drop_edge_attrs, complete_rows, self._seen)
+        if not (self.workers > 1 and len(self.entity_types) > 1 and can_fork()):
+            return [column_job(col, state) for col in self.entity_types]
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _worker_state = state
+        try:
+            # Leaving the block waits for the workers to exit, including after errors
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(self.entity_types)),
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(forked_column_job, self.entity_types))
+        finally:
+            _worker_state = None
+        columns = []
+        for (col, (values, attribs)) in zip(self.entity_types, results):
+            edges = None
+            if attribs is not None:
+                (codes, ids) = attribs
+                rows = edge_rows(events, col, self.defs, self.drop_na, complete_rows)
+                edges = edge_frame(events, col, rows, ids.take(codes), self.defs, drop_edge_attrs)
+            columns.append((values, edges))
+        return columns
+
+    def build(self, verbose=True):
+        if self._event_columns is None:
+            raise ValueError('No events were added to the hypergraph')
+        defs = self.defs
+        entities = entities_frame([(col, concat_series([v for (v, _) in self._entity_values[col]]),
+                                    concat_series([s for (_, s) in self._entity_values[col]]))
+                                   for col in self.entity_types], defs)
+        event_entities = self._event_nodes[0] if len(self._event_nodes) == 1 \
+            else pd.concat(self._event_nodes, ignore_index=True)
+        edges = hyperedges_frame([frame for col in sorted(self._edges) for frame in self._edges[col]],
+                                 self._event_columns, defs, self.drop_edge_attrs or self.normalize_edges)
+        if self._incomplete_events:
+            util.warn('normalize_edges dropped the edges of %d events with missing values, as drop_edge_attrs=False does. '
+                      'Use drop_na=False to keep them, or drop_edge_attrs=True to only drop the edges of missing values.'
+                      % self._incomplete_events)
         if verbose:
             print('# links', len(edges))
-            print('# event entities', len(events))
+            print('# event entities', len(event_entities))
             print('# attrib entities', len(entities))
-        return hyperbinding(g, defs, entities, event_entities, edges)
+        return hyperbinding(self.g, defs, entities, event_entities, edges, self.integer_ids)
+
+# (entity values, edges) of column col, given the state of HypergraphBuilder._map_columns()
+def column_job(col, state):
+    (events, defs, drop_na, drop_edge_attrs, complete_rows, seen) = state
+    rows = edge_rows(events, col, defs, drop_na, complete_rows)
+    edges = edge_frame(events, col, rows, attrib_ids(events, col, rows, defs), defs, drop_edge_attrs)
+    return (entity_values(events[col], drop_na, seen.get(col)), edges)
+
+# State of the worker processes of HypergraphBuilder, inherited when forking them
+_worker_state = None
+
+# Same as column_job in a worker process, with the attribute ids of the edges as (codes into
+# the distinct ids, distinct ids), or None without edges.
+def forked_column_job(col):
+    (events, defs, drop_na, drop_edge_attrs, complete_rows, seen) = _worker_state
+    rows = edge_rows(events, col, defs, drop_na, complete_rows)
+    attribs = None
+    if rows is None or rows.any():
+        (codes, ids) = pd.factorize(attrib_ids(events, col, rows, defs).values)
+        attribs = (codes, np.asarray(ids, dtype=object))
+    return (entity_values(events[col], drop_na, seen.get(col)), attribs)
+
+# Worker processes are forked, so that they hash (eg. order sets) like this process, and do not
+# import the main module again (Python 3.7+ on Unix)
+def can_fork():
+    if sys.version_info < (3, 7):
+        return False
+    import multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+def concat_series(parts):
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+###########        
+
+class Hypergraph(object):        
+
+    @staticmethod
+    def hypergraph(g, raw_events, entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False, verbose=True,
+                   normalize_edges=False, integer_ids=False, workers=None):
+        builder = HypergraphBuilder(g, entity_types, opts, drop_na, drop_edge_attrs, normalize_edges, integer_ids,
+                                    workers)
+        for chunk in ([raw_events] if isinstance(raw_events, pd.DataFrame) else raw_events):
+            builder.add(chunk)
+        return builder.build(verbose)
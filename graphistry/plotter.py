@@ -5,10 +5,12 @@ from builtins import object
 import copy
 import numpy
 import pandas
+import requests
 
 from .pygraphistry import PyGraphistry
 from .pygraphistry import util
 from .pygraphistry import bolt_util
+from . import cache
 
 
 class Plotter(object):
@@ -21,6 +23,8 @@ class Plotter(object):
     To streamline reuse and replayable notebooks, Plotter manipulations are immutable. Each chained call returns a new instance that derives from the previous one. The old plotter or the new one can then be used to create different graphs.
 
     The class supports convenience methods for mixing calls across Pandas, NetworkX, and IGraph.
+
+    Recently encoded datasets are remembered (see ``PyGraphistry.plot_memo()``), so plotting the same data again, for instance after changing settings or colors, skips re-encoding it.
     """
 
 
@@ -48,6 +52,9 @@ class Plotter(object):
         self._url_params = {'info': 'true'}
         # Integrations
         self._bolt_driver = None
+        self._bolt_ids = None
+        # Edges/nodes (and their bindings) known to be clean, with dense node ids
+        self._dense = None
 
 
     def __repr__(self):
@@ -286,7 +293,7 @@ class Plotter(object):
         :param render: Whether to render the visualization using the native notebook environment (default True), or return the visualization URL
         :type render: Boolean
 
-        :param skip_upload: Return node/edge/bindings that would have been uploaded. By default, upload happens.
+        :param skip_upload: Return node/edge/bindings that would have been uploaded. By default, upload happens. With API version 2, the dataset's 'vgraph' is a graph_vector_pb2.VectorGraph message.
         :type skip_upload: Boolean. 
 
         **Example: Simple**
@@ -310,28 +317,14 @@ class Plotter(object):
 
         """
 
-        if graph is None:
-            if self._edges is None:
-                util.error('Graph/edges must be specified.')
-            g = self._edges
-        else:
-            g = graph
-        n = self._nodes if nodes is None else nodes
-        name = name or util.random_string(10)
-
-        self._check_mandatory_bindings(not isinstance(n, type(None)))
-
         api_version = PyGraphistry.api_version()
-        if (api_version == 1):
-            dataset = self._plot_dispatch(g, n, name, 'json')
-            if skip_upload:
-                return dataset
-            info = PyGraphistry._etl1(dataset)
-        elif (api_version == 2):
-            dataset = self._plot_dispatch(g, n, name, 'vgraph')
-            if skip_upload:
-                return dataset
-            info = PyGraphistry._etl2(dataset)
+        if skip_upload:
+            dataset = self._plot_dataset(graph, nodes, name, api_version)
+            # Uploads write vgraphs directly, but callers get the protobuf message they can inspect
+            if hasattr(dataset.get('vgraph'), 'toProtobuf'):
+                dataset = dict(dataset, vgraph=dataset['vgraph'].toProtobuf())
+            return dataset
+        info = self._plot_info(graph, nodes, name, api_version)
 
         viz_url = PyGraphistry._viz_url(info, self._url_params)
         full_url = '%s:%s' % (PyGraphistry._config['protocol'], viz_url)
@@ -347,6 +340,56 @@ class Plotter(object):
             return full_url
 
 
+    def plot_async(self, graph=None, nodes=None, name=None, executor=None):
+        """Upload data to the Graphistry server in the background.
+
+        Same as ``plot(render=False)``, except that encoding, compression and upload run on a background executor and the call returns immediately.
+
+        :param graph: Edge table or graph.
+        :type graph: Pandas dataframe, NetworkX graph, or IGraph graph.
+
+        :param nodes: Nodes table.
+        :type nodes: Pandas dataframe.
+
+        :param executor: Executor running the upload. By default, a thread pool shared by all plotters, sized like the HTTP connection pool (see ``register(http_pool_size=...)``).
+        :type executor: concurrent.futures.Executor.
+
+        :returns: Future resolving to the visualization URL.
+        :rtype: concurrent.futures.Future.
+
+        **Example: Several graphs at once**
+            ::
+
+                import graphistry
+                g = graphistry.bind(source='src', destination='dst')
+                futures = [g.plot_async(es) for es in [es1, es2, es3]]
+                urls = [f.result() for f in futures]
+
+        """
+
+        executor = executor or PyGraphistry._plot_executor()
+        return executor.submit(self._plot_url, graph, nodes, name)
+
+
+    def plot_asyncio(self, graph=None, nodes=None, name=None, executor=None):
+        """Asyncio variant of ``plot_async()``, returning an awaitable asyncio future.
+
+        **Example**
+            ::
+
+                import asyncio
+                import graphistry
+
+                async def dashboard(es1, es2):
+                    g = graphistry.bind(source='src', destination='dst')
+                    return await asyncio.gather(g.plot_asyncio(es1), g.plot_asyncio(es2))
+
+        """
+
+        import asyncio
+        return asyncio.wrap_future(self.plot_async(graph, nodes, name, executor))
+
+
     def pandas2igraph(self, edges, directed=True):
         """Convert a pandas edge dataframe to an IGraph graph.
 
@@ -468,7 +511,164 @@ class Plotter(object):
                 util.error('%s attribute "%s" bound to "%s" does not exist.' % (typ, a, b))
 
 
+    def _plot_data(self, graph, nodes):
+        if graph is None:
+            if self._edges is None:
+                util.error('Graph/edges must be specified.')
+            g = self._edges
+        else:
+            g = graph
+        n = self._nodes if nodes is None else nodes
+        return (g, n)
+
+
+    # Create the payload of the given API version, using the current bindings and data
+    # unless overridden.
+    def _plot_dataset(self, graph, nodes, name, api_version):
+        (g, n) = self._plot_data(graph, nodes)
+        name = name or util.random_string(10)
+
+        self._check_mandatory_bindings(not isinstance(n, type(None)))
+
+        if (api_version == 1):
+            return self._plot_dispatch(g, n, name, 'json')
+        elif (api_version == 2):
+            return self._plot_dispatch(g, n, name, 'vgraph')
+        else:
+            util.error('Unsupported API version: %s' % api_version)
+
+
+    def _plot_upload(self, dataset, api_version):
+        if (api_version == 1):
+            return PyGraphistry._etl1(dataset)
+        if not PyGraphistry.incremental_uploads():
+            return PyGraphistry._etl2(dataset)
+
+        # Data is identified by the hash of its content (see _plot_dispatch), so data modified
+        # since it was uploaded is uploaded again.
+        content = dataset.get('content')
+        if content is None:
+            return PyGraphistry._etl2(dataset)
+        config = PyGraphistry._config
+        key = cache.digest([config['protocol'], config['hostname'], config['api_key'], content])
+        uploaded = PyGraphistry._uploaded_data()
+        data_from = uploaded.get(key, [])
+        if data_from is not None:
+            try:
+                return PyGraphistry._etl2(dataset, data_from=data_from)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                util.warn('Incremental upload failed, uploading all data (%s)' % e)
+        info = PyGraphistry._etl2(dataset)
+        uploaded.put(key, [], info['name'], 1)
+        return info
+
+
+    # Encode and upload, unless the upload cache knows of an identical upload.
+    def _plot_info(self, graph, nodes, name, api_version):
+        upload_cache = PyGraphistry._upload_cache()
+        key = self._upload_key(graph, nodes, name, api_version) if upload_cache else None
+        if key is not None:
+            info = upload_cache.get(key)
+            if info is not None:
+                return info
+
+        dataset = self._plot_dataset(graph, nodes, name, api_version)
+        info = self._plot_upload(dataset, api_version)
+        if key is not None:
+            upload_cache.put(key, info)
+        return info
+
+
+    # Content address of an upload: hashes of the dataframes, every binding, and the
+    # destination. Returns None when the data cannot be hashed (eg. IGraph/NetworkX graphs).
+    def _upload_key(self, graph, nodes, name, api_version):
+        (g, n) = self._plot_data(graph, nodes)
+        digests = Plotter._frame_digests(g, n)
+        if digests is None:
+            return None
+        (edges_digest, nodes_digest) = digests
+
+        bindings = ['source', 'destination', 'node', 'edge_title', 'edge_label', 'edge_color',
+                    'edge_weight', 'point_title', 'point_label', 'point_color', 'point_size']
+        config = PyGraphistry._config
+        return cache.digest({
+            'edges': edges_digest,
+            'nodes': nodes_digest,
+            'bindings': dict([(b, getattr(self, '_' + b)) for b in bindings]),
+            'name': name,
+            'api_version': api_version,
+            'server': [config['protocol'], config['hostname'], config['dataset_prefix'], config['api_key']]
+        })
+
+
+    # Content hashes of the edges and nodes dataframes, or None when they cannot be hashed.
+    @staticmethod
+    def _frame_digests(graph, nodes):
+        if not isinstance(graph, pandas.DataFrame) or not (nodes is None or isinstance(nodes, pandas.DataFrame)):
+            return None
+        edges_digest = cache.frame_digest(graph)
+        nodes_digest = None if nodes is None else cache.frame_digest(nodes)
+        if edges_digest is None or (nodes is not None and nodes_digest is None):
+            return None
+        return (edges_digest, nodes_digest)
+
+
+    # Encode and upload, then return the full visualization URL.
+    def _plot_url(self, graph, nodes, name):
+        api_version = PyGraphistry.api_version()
+        info = self._plot_info(graph, nodes, name, api_version)
+        viz_url = PyGraphistry._viz_url(info, self._url_params)
+        return '%s:%s' % (PyGraphistry._config['protocol'], viz_url)
+
+
+    # Reuse the dataset recently encoded from the same edges/nodes content with the same data
+    # bindings (see PyGraphistry.plot_memo). Only the name and, in vgraph mode, the visual
+    # encodings are refreshed. Callers get their own copy of the dataset dict.
+    # Incremental uploads identify vgraph data by the same key, stored as the 'content' of datasets.
     def _plot_dispatch(self, graph, nodes, name, mode='json'):
+        memo = PyGraphistry._plot_memo()
+        incremental = mode == 'vgraph' and PyGraphistry.incremental_uploads()
+        key = self._memo_key(graph, nodes, mode) if memo or incremental else None
+        dataset = memo.get(key, []) if memo and key is not None else None
+        if dataset is None:
+            dataset = self._plot_dispatch_uncached(graph, nodes, name, mode)
+            if key is not None and mode == 'vgraph':
+                dataset['content'] = key
+            if memo and key is not None:
+                memo.put(key, [], dict(dataset), Plotter._dataset_size(graph, nodes))
+            return dataset
+
+        if mode == 'json':
+            return dict(dataset, name=PyGraphistry._config['dataset_prefix'] + name)
+        vg = copy.copy(dataset['vgraph'])
+        vg.name = name
+        attributes = dataset['attributes']
+        edge_columns = list(attributes['edges']) + [self._source, self._destination]
+        node_columns = list(attributes['nodes'])
+        return dict(dataset, name=name, vgraph=vg, encodings=self._encodings_v2(edge_columns, node_columns))
+
+
+    # Key of the datasets encoded in the given mode from the content of graph and nodes
+    # with the current data bindings. Returns None when the data cannot be hashed.
+    def _memo_key(self, graph, nodes, mode):
+        digests = Plotter._frame_digests(graph, nodes)
+        if digests is None:
+            return None
+        bindings = ['source', 'destination', 'node']
+        if mode == 'json':
+            bindings += ['edge_title', 'edge_label', 'edge_color', 'edge_weight',
+                         'point_title', 'point_label', 'point_color', 'point_size']
+        return cache.digest([mode, list(digests)] + [getattr(self, '_' + b) for b in bindings])
+
+
+    # Memory held by a memoized dataset: about the size of the dataframes it was made from,
+    # as vgraphs keep their columns until serialized, and json datasets copy them.
+    @staticmethod
+    def _dataset_size(graph, nodes):
+        return sum(df.memory_usage(deep=True).sum() for df in [graph, nodes] if df is not None)
+
+
+    def _plot_dispatch_uncached(self, graph, nodes, name, mode):
         if isinstance(graph, pandas.core.frame.DataFrame):
             return self._make_dataset(graph, nodes, name, mode)
 
@@ -505,9 +705,6 @@ class Plotter(object):
         elist = edges.reset_index(drop=True) \
                      .dropna(subset=[self._source, self._destination])
 
-        obj_df = elist.select_dtypes(include=[numpy.object_])
-        elist[obj_df.columns] = obj_df.apply(pandas.to_numeric, errors='ignore')
-
         if nodes is None:
             nodes = pandas.DataFrame()
             nodes[nodeid] = pandas.concat([edges[self._source], edges[self._destination]],
@@ -519,10 +716,20 @@ class Plotter(object):
                      .dropna(subset=[nodeid]) \
                      .drop_duplicates(subset=[nodeid])
 
-        obj_df = nlist.select_dtypes(include=[numpy.object_])
-        nlist[obj_df.columns] = obj_df.apply(pandas.to_numeric, errors='ignore')
+        return (Plotter._infer_numeric(elist), Plotter._infer_numeric(nlist))
 
-        return (elist, nlist)
+
+    # Convert the object columns holding numbers (eg. numeric strings) to numeric columns.
+    # Returns df itself when it has no object columns, and otherwise a new dataframe.
+    @staticmethod
+    def _infer_numeric(df):
+        obj_df = df.select_dtypes(include=[numpy.object_])
+        if len(obj_df.columns) == 0:
+            return df
+        res = df.copy(deep=False)
+        for (i, col) in enumerate(obj_df.columns):
+            res[col] = pandas.to_numeric(obj_df.iloc[:, i], errors='ignore')
+        return res
 
 
     def _check_dataset_size(self, elist, nlist):
@@ -567,10 +774,18 @@ class Plotter(object):
     # Bind attributes for ETL2 by an encodings map storing the visual semantic of
     # each bound column.
     def _bind_attributes_v2(self, edges, nodes):
-        def bind(enc, df, pbname, attrib, default=None):
+        nodeid = self._node or Plotter._defaultNodeId
+        (elist, nlist) = self._sanitize_dataset(edges, nodes, nodeid)
+        self._check_dataset_size(elist, nlist)
+        encodings = self._encodings_v2(elist.columns.tolist(), nlist.columns.tolist())
+        return (elist, nlist, encodings)
+
+
+    def _encodings_v2(self, edge_columns, node_columns):
+        def bind(enc, columns, pbname, attrib, default=None):
             bound = getattr(self, attrib)
             if bound:
-                if bound in df.columns.tolist():
+                if bound in columns:
                     enc[pbname] = {'attributes' : [bound]}
                 else:
                     util.warn('Attribute "%s" bound to %s does not exist.' % (bound, attrib))
@@ -578,9 +793,6 @@ class Plotter(object):
                 enc[pbname] = {'attributes': [default]}
 
         nodeid = self._node or Plotter._defaultNodeId
-        (elist, nlist) = self._sanitize_dataset(edges, nodes, nodeid)
-        self._check_dataset_size(elist, nlist)
-
         edge_encodings = {
             'source': {'attributes' : [self._source]},
             'destination': {'attributes': [self._destination]},
@@ -588,20 +800,19 @@ class Plotter(object):
         node_encodings = {
             'nodeId': {'attributes': [nodeid]}
         }
-        bind(edge_encodings, elist, 'edgeColor', '_edge_color')
-        bind(edge_encodings, elist, 'edgeLabel', '_edge_label')
-        bind(edge_encodings, elist, 'edgeTitle', '_edge_title')
-        bind(edge_encodings, elist, 'edgeWeight', '_edge_weight')
-        bind(node_encodings, nlist, 'pointColor', '_point_color')
-        bind(node_encodings, nlist, 'pointLabel', '_point_label')
-        bind(node_encodings, nlist, 'pointTitle', '_point_title', nodeid)
-        bind(node_encodings, nlist, 'pointSize', '_point_size')
-
-        encodings = {
+        bind(edge_encodings, edge_columns, 'edgeColor', '_edge_color')
+        bind(edge_encodings, edge_columns, 'edgeLabel', '_edge_label')
+        bind(edge_encodings, edge_columns, 'edgeTitle', '_edge_title')
+        bind(edge_encodings, edge_columns, 'edgeWeight', '_edge_weight')
+        bind(node_encodings, node_columns, 'pointColor', '_point_color')
+        bind(node_encodings, node_columns, 'pointLabel', '_point_label')
+        bind(node_encodings, node_columns, 'pointTitle', '_point_title', nodeid)
+        bind(node_encodings, node_columns, 'pointSize', '_point_size')
+
+        return {
             'nodes': node_encodings,
             'edges': edge_encodings
         }
-        return (elist, nlist, encodings)
 
 
     def _make_dataset(self, edges, nodes, name, mode):
@@ -632,27 +843,65 @@ class Plotter(object):
         return dataset
 
 
+    # Mark the current edges and nodes as clean: no missing ids, and node ids numbered
+    # 0..#nodes-1 in node order, with every edge endpoint in this range. Plotting them
+    # then skips sanitizing the dataset and hashing node ids, as long as the ids still
+    # look so (the dataframes may be modified in place).
+    def _with_dense_ids(self):
+        res = copy.copy(self)
+        res._dense = (self._edges, self._nodes, self._source, self._destination, self._node)
+        return res
+
+
+    def _has_dense_ids(self, edges, nodes):
+        if self._dense is None:
+            return False
+        (dense_edges, dense_nodes, source, destination, node) = self._dense
+        if dense_edges is not edges or dense_nodes is not nodes or \
+           (source, destination, node) != (self._source, self._destination, self._node):
+            return False
+
+        def in_range(df, column):
+            return column in df.columns and df[column].dtype.kind in 'iu' and \
+                (len(df) == 0 or (df[column].min() >= 0 and df[column].max() < len(nodes)))
+        return in_range(edges, source) and in_range(edges, destination) and in_range(nodes, node) and \
+            numpy.array_equal(nodes[node].values, numpy.arange(len(nodes)))
+
+
     # Main helper for creating ETL2 payload
     def _make_vgraph_dataset(self, edges, nodes, name):
         from . import vgraph
 
-        (elist, nlist, encodings) = self._bind_attributes_v2(edges, nodes)
         nodeid = self._node or Plotter._defaultNodeId
+        if self._has_dense_ids(edges, nodes):
+            # Ids need no checks, but attributes get the same numeric types as when sanitized
+            self._check_dataset_size(edges, nodes)
+            encodings = self._encodings_v2(edges.columns.tolist(), nodes.columns.tolist())
+            elist = Plotter._infer_numeric(edges.drop([self._source, self._destination], axis=1))
+            node_index = pandas.RangeIndex(len(nodes), name=nodeid)
+            dataset = vgraph.create(elist, Plotter._infer_numeric(nodes),
+                                    edges[self._source].values, edges[self._destination].values,
+                                    nodeid, node_index, name, direct=True)
+            dataset['encodings'] = encodings
+            return dataset
+
+        (elist, nlist, encodings) = self._bind_attributes_v2(edges, nodes)
 
         sources = elist[self._source]
         dests = elist[self._destination]
         elist.drop([self._source, self._destination], axis=1, inplace=True)
 
-        # Filter out nodes which have no edges
-        lnodes = pandas.concat([sources, dests], ignore_index=True).unique()
-        lnodes_df = pandas.DataFrame(lnodes, columns=[nodeid])
-        filtered_nlist = pandas.merge(lnodes_df, nlist, on=nodeid, how='left')
-
-        # Create a map from nodeId to a continuous range of integer [0, #nodes-1].
+        # Factorize nodeIds into a continuous range of integer [0, #nodes-1].
         # The vgraph protobuf format uses the continous integer ranger as internal nodeIds.
-        node_map = dict([(v, i) for i, v in enumerate(lnodes.tolist())])
+        (codes, node_index) = pandas.factorize(pandas.concat([sources, dests], ignore_index=True))
+        node_index = pandas.Index(node_index, name=nodeid)
+        src_ids = codes[:len(sources)]
+        dst_ids = codes[len(sources):]
 
-        dataset = vgraph.create(elist, filtered_nlist, sources, dests, nodeid, node_map, name)
+        # Filter out nodes which have no edges, and order the remaining ones by id
+        filtered_nlist = nlist.set_index(nodeid).reindex(node_index).reset_index()
+
+        dataset = vgraph.create(elist, filtered_nlist, src_ids, dst_ids, nodeid, node_index, name, direct=True)
         dataset['encodings'] = encodings
         return dataset
 
@@ -663,14 +912,29 @@ class Plotter(object):
         return res
 
 
-    def cypher(self, query, params={}):
+    # Bolt drivers cannot be pickled, eg. to encode in another process
+    def _without_bolt(self):
+        res = copy.copy(self)
+        res._bolt_driver = None
+        return res
+
+
+    def cypher(self, query, params={}, partitions=None, sparse=False):
         res = copy.copy(self)
         driver = self._bolt_driver or PyGraphistry._config['bolt_driver']
-        with driver.session() as session:
-            bolt_statement = session.run(query, **params)
-            graph = bolt_statement.graph()
-            edges = bolt_util.bolt_graph_to_edges_dataframe(graph)
-            nodes = bolt_util.bolt_graph_to_nodes_dataframe(graph)
+        cypher_cache = PyGraphistry._cypher_cache()
+        key = cache.digest([query, params, partitions, sparse]) if cypher_cache else None
+        result = cypher_cache.get(key, [driver]) if key is not None else None
+        if result is not None:
+            (edges, nodes) = result
+        else:
+            if partitions is None:
+                (edges, nodes) = bolt_util.run_query(driver, query, params, sparse)
+            else:
+                (edges, nodes) = bolt_util.run_partitioned_query(driver, query, params, partitions, sparse)
+            if key is not None:
+                size = edges.memory_usage(deep=True).sum() + nodes.memory_usage(deep=True).sum()
+                cypher_cache.put(key, [driver], (edges, nodes), size)
         return res\
             .bind(\
                 node=bolt_util.node_id_key,\
@@ -679,3 +943,69 @@ class Plotter(object):
             )\
             .nodes(nodes)\
             .edges(edges)
+
+
+    def expand_cypher(self, query, seeds=None, seeds_param='seeds', params={}, sparse=False):
+        """Expand the current graph with the results of a cypher query run from seed nodes.
+
+        The seed node ids are sent at once as the list parameter ``seeds_param`` of the query, which typically ``UNWIND``s them. Nodes and relationships that are not in the graph yet are appended to its nodes and edges, and the ones already there are left as is.
+
+        :param query: a cypher query
+        :param seeds: Bolt ids of the seed nodes, defaults to all the current nodes
+        :param seeds_param: Name of the query parameter receiving the seed ids
+        :param params: Other cypher query arguments
+        :param sparse: Whether to store the properties missing from some new nodes or edges in sparse columns, see ``PyGraphistry.cypher()``
+        :return: Plotter with the current and the new nodes and edges. This call binds `source`, `destination`, and `node`.
+
+        **Example**
+                ::
+
+                    import graphistry
+                    g = graphistry.cypher('MATCH (a:Account {id: $id}) RETURN a', {'id': 10})
+                    g = g.expand_cypher('UNWIND $seeds AS seed MATCH (a)-[r:PAYMENT]-(b) WHERE id(a) = seed RETURN a, r, b')
+                    g = g.expand_cypher('UNWIND $seeds AS seed MATCH (a)-[r:PAYMENT]-(b) WHERE id(a) = seed RETURN a, r, b', seeds=[42])
+        """
+        if seeds is None:
+            seeds = [] if self._nodes is None else self._nodes.get(bolt_util.node_id_key, [])
+        found = self.cypher(query, util.merge_two_dicts(params, {seeds_param: numpy.asarray(seeds).tolist()}), sparse=sparse)
+        if self._nodes is None or self._edges is None:
+            return found
+
+        (node_index, edge_index) = self._bolt_indexes()
+        (nodes, node_index) = Plotter._append_new(self._nodes, node_index, found._nodes, bolt_util.node_id_key)
+        (edges, edge_index) = Plotter._append_new(self._edges, edge_index, found._edges, bolt_util.relationship_id_key)
+        res = found.nodes(nodes).edges(edges)
+        res._bolt_ids = (nodes, node_index, edges, edge_index)
+        return res
+
+
+    # Indexes of the bolt ids of the current nodes and edges. Plotters returned by expand_cypher()
+    # carry them along, so that successive expansions do not index the whole graph every time.
+    def _bolt_indexes(self):
+        if self._bolt_ids is not None and self._bolt_ids[0] is self._nodes and self._bolt_ids[2] is self._edges:
+            return (self._bolt_ids[1], self._bolt_ids[3])
+        def ids(df, key):
+            return pandas.Index(df[key] if key in df.columns else []).unique()
+        return (ids(self._nodes, bolt_util.node_id_key), ids(self._edges, bolt_util.relationship_id_key))
+
+
+    # Append the rows of df whose key is not in index (the unique keys of existing), and return
+    # the result along with its keys.
+    @staticmethod
+    def _append_new(existing, index, df, key):
+        if key not in df.columns or len(df) == 0:
+            return (existing, index)
+        new_rows = df[index.get_indexer(df[key]) == -1]
+        if len(new_rows) == 0:
+            return (existing, index)
+        merged = pandas.concat([existing, new_rows], ignore_index=True)
+        return (merged, index.append(pandas.Index(new_rows[key])))
+
+
+# Entry point of the processes encoding datasets for PyGraphistry.plot_many(). Vgraph columns
+# are encoded there, instead of being sent back to be encoded when uploaded.
+def _plot_dataset_job(plotter, name, api_version):
+    dataset = plotter._plot_dataset(None, None, name, api_version)
+    if hasattr(dataset.get('vgraph'), 'encodeDeferred'):
+        dataset['vgraph'].encodeDeferred()
+    return dataset
@@ -17,14 +17,17 @@ import time
 from datetime import datetime
 from distutils.util import strtobool
 import gzip
-import io
+import itertools
 import json
+import tempfile
 import requests
 import pandas
 import numpy
 
 from . import util
 from . import bolt_util
+from . import compress
+from . import cache
 
 
 EnvVarNames = {
@@ -33,7 +36,15 @@ EnvVarNames = {
     'dataset_prefix': 'GRAPHISTRY_DATASET_PREFIX',
     'hostname': 'GRAPHISTRY_HOSTNAME',
     'protocol': 'GRAPHISTRY_PROTOCOL',
-    'certificate_validation': 'GRAPHISTRY_CERTIFICATE_VALIDATION'
+    'certificate_validation': 'GRAPHISTRY_CERTIFICATE_VALIDATION',
+    'compression_level': 'GRAPHISTRY_COMPRESSION_LEVEL',
+    'compression_threads': 'GRAPHISTRY_COMPRESSION_THREADS',
+    'http_pool_size': 'GRAPHISTRY_HTTP_POOL_SIZE',
+    'http_timeout': 'GRAPHISTRY_HTTP_TIMEOUT',
+    'upload_cache': 'GRAPHISTRY_UPLOAD_CACHE',
+    'incremental_uploads': 'GRAPHISTRY_INCREMENTAL_UPLOADS',
+    'cypher_cache': 'GRAPHISTRY_CYPHER_CACHE',
+    'plot_memo': 'GRAPHISTRY_PLOT_MEMO'
 }
 
 config_paths = [
@@ -48,7 +59,22 @@ default_config = {
     'dataset_prefix': 'PyGraphistry/',
     'hostname': 'labs.graphistry.com',
     'protocol': 'https',
-    'certificate_validation': True
+    'certificate_validation': True,
+    'compression_level': 9,
+    'compression_threads': 1,
+    'http_pool_size': 10,
+    'http_timeout': 300,
+    'upload_cache': False,
+    'upload_cache_dir': os.path.join(os.path.expanduser('~'), '.graphistry', 'upload_cache'),
+    'upload_cache_max_entries': 1000,
+    'upload_cache_max_age': 7 * 24 * 3600, # seconds
+    'incremental_uploads': False,
+    'cypher_cache': False,
+    'cypher_cache_max_size': 256 * 1024 * 1024, # bytes
+    'cypher_cache_max_age': 300, # seconds
+    'plot_memo': False,
+    'plot_memo_max_size': 256 * 1024 * 1024, # bytes
+    'plot_memo_max_age': 300 # seconds
 }
 
 
@@ -76,6 +102,14 @@ class PyGraphistry(object):
     _config = _get_initial_config()
     _tag = util.fingerprint()
     _is_authenticated = False
+    _spool_max_size = 64 * 1024 * 1024 # Compressed payloads larger than this are spooled to disk
+    _upload_bandwidth = None # Measured upload throughput in bytes/s, used by the 'auto' compression level
+    _session = None # Connection pool shared by all server calls, see _http()
+    _executor = None # Thread pool running Plotter.plot_async(), see _plot_executor()
+    _cypher_results = None # Recent cypher() results, see _cypher_cache()
+    _plot_datasets = None # Recently encoded datasets, see _plot_memo()
+    _uploaded = None # Names of the datasets holding uploaded vgraph data, see _uploaded_data()
+    _uploaded_max_entries = 1000
 
 
     @staticmethod
@@ -160,13 +194,134 @@ class PyGraphistry(object):
         PyGraphistry._config['certificate_validation'] = v
 
 
+    @staticmethod
+    def compression_level(value=None):
+        """Set or get the gzip compression level of uploads (0-9, or 'auto').
+        Lower levels compress faster but upload more bytes. In 'auto' mode, the level is picked
+        per upload based on the payload size, the compression speed measured on a sample of the
+        payload, and the upload throughput measured on previous uploads.
+        Also set via environment variable GRAPHISTRY_COMPRESSION_LEVEL."""
+        if value is None:
+            return compress.check_level(PyGraphistry._config['compression_level'])
+        # setter
+        PyGraphistry._config['compression_level'] = compress.check_level(value)
+
+
+    @staticmethod
+    def compression_threads(value=None):
+        """Set or get the number of threads compressing uploads (default 1).
+        With more than one thread, payloads are split into blocks compressed in parallel
+        into a single gzip stream.
+        Also set via environment variable GRAPHISTRY_COMPRESSION_THREADS."""
+        if value is None:
+            return compress.check_threads(PyGraphistry._config['compression_threads'])
+        # setter
+        PyGraphistry._config['compression_threads'] = compress.check_threads(value)
+
+
+    @staticmethod
+    def http_pool_size(value=None):
+        """Set or get the maximum number of connections kept alive to the server (default 10).
+        Also set via environment variable GRAPHISTRY_HTTP_POOL_SIZE."""
+        if value is None:
+            return int(PyGraphistry._config['http_pool_size'])
+        # setter
+        if int(value) < 1:
+            util.error('HTTP pool size must be a positive integer (got %s)' % value)
+        PyGraphistry._config['http_pool_size'] = int(value)
+        if PyGraphistry._session is not None:
+            PyGraphistry._session.close()
+            PyGraphistry._session = None
+
+
+    @staticmethod
+    def http_timeout(value=None):
+        """Set or get the timeout in seconds of server calls, applied to connecting and to each read (default 300).
+        Also set via environment variable GRAPHISTRY_HTTP_TIMEOUT."""
+        if value is None:
+            return float(PyGraphistry._config['http_timeout'])
+        # setter
+        if float(value) <= 0:
+            util.error('HTTP timeout must be a positive number of seconds (got %s)' % value)
+        PyGraphistry._config['http_timeout'] = float(value)
+
+
+    @staticmethod
+    def upload_cache(value=None):
+        """Enable/Disable the upload cache (True, False). Disabled by default.
+        When enabled, plotting the same data with the same bindings again reuses the dataset
+        uploaded the first time, instead of encoding and uploading it again.
+        Entries are stored on disk under the 'upload_cache_dir' setting, and evicted past
+        'upload_cache_max_entries' entries or 'upload_cache_max_age' seconds.
+        Also set via environment variable GRAPHISTRY_UPLOAD_CACHE."""
+        if value is None:
+            v = PyGraphistry._config['upload_cache']
+            return bool(strtobool(v)) if isinstance(v, basestring) else v
+        # setter
+        PyGraphistry._config['upload_cache'] = bool(strtobool(value)) if isinstance(value, basestring) else value
+
+
+    @staticmethod
+    def incremental_uploads(value=None):
+        """Enable/Disable incremental uploads (True, False). Disabled by default.
+        When enabled, replotting data already uploaded with different visual bindings (colors,
+        sizes, labels, titles) only sends the new bindings, and the server reuses the data of the
+        first upload. Data is compared by content, so dataframes modified in place are uploaded again. Requires a server supporting metadata-only updates,
+        which confirms reusing the data by naming its dataset as 'reused' in its response: uploads fall back to sending
+        everything when the server rejects them or does not confirm.
+        Also set via environment variable GRAPHISTRY_INCREMENTAL_UPLOADS."""
+        if value is None:
+            v = PyGraphistry._config['incremental_uploads']
+            return bool(strtobool(v)) if isinstance(v, basestring) else v
+        # setter
+        PyGraphistry._config['incremental_uploads'] = bool(strtobool(value)) if isinstance(value, basestring) else value
+
+
+    @staticmethod
+    def cypher_cache(value=None):
+        """Enable/Disable the cypher() result cache (True, False). Disabled by default.
+        When enabled, running the same query with the same parameters on the same driver again
+        returns the dataframes of the first run, without contacting the database.
+        Results are kept in memory for 'cypher_cache_max_age' seconds, and the least recently used
+        ones are evicted once they take more than 'cypher_cache_max_size' bytes.
+        Also set via environment variable GRAPHISTRY_CYPHER_CACHE."""
+        if value is None:
+            v = PyGraphistry._config['cypher_cache']
+            return bool(strtobool(v)) if isinstance(v, basestring) else v
+        # setter
+        PyGraphistry._config['cypher_cache'] = bool(strtobool(value)) if isinstance(value, basestring) else value
+        if not PyGraphistry.cypher_cache():
+            PyGraphistry._cypher_results = None
+
+
+    @staticmethod
+    def plot_memo(value=None):
+        """Enable/Disable the memo of encoded datasets (True, False). Disabled by default.
+        When enabled, plotting the same data with the same data bindings again, for instance after
+        changing settings or colors, reuses the recent encoding of that data. Data is compared by
+        content, so dataframes modified in place are encoded again. Comparing costs a hash of the
+        edges and nodes on every plot (about a second per million rows).
+        Encodings are kept in memory for 'plot_memo_max_age' seconds, and the least recently used
+        ones are evicted once they take more than 'plot_memo_max_size' bytes.
+        Also set via environment variable GRAPHISTRY_PLOT_MEMO."""
+        if value is None:
+            v = PyGraphistry._config['plot_memo']
+            return bool(strtobool(v)) if isinstance(v, basestring) else v
+        # setter
+        PyGraphistry._config['plot_memo'] = bool(strtobool(value)) if isinstance(value, basestring) else value
+        if not PyGraphistry.plot_memo():
+            PyGraphistry._plot_datasets = None
+
+
     @staticmethod
     def set_bolt_driver(driver=None):
         PyGraphistry._config['bolt_driver'] = bolt_util.to_bolt_driver(driver)
 
 
     @staticmethod
-    def register(key=None, server=None, protocol=None, api=None, certificate_validation=None, bolt=None):
+    def register(key=None, server=None, protocol=None, api=None, certificate_validation=None, bolt=None,
+                 compression_level=None, compression_threads=None, http_pool_size=None, http_timeout=None,
+                 upload_cache=None, incremental_uploads=None, cypher_cache=None, plot_memo=None):
         """API key registration and server selection
 
         Changing the key effects all derived Plotter instances.
@@ -177,6 +332,22 @@ class PyGraphistry(object):
         :type server: Optional string.
         :param protocol: Protocol used to contact visualization server
         :type protocol: Optional string.
+        :param compression_level: Gzip level of uploads, from 0 (fastest) to 9 (smallest, default), or 'auto'
+        :type compression_level: Optional integer or string.
+        :param compression_threads: Number of threads compressing uploads in parallel, defaults to 1
+        :type compression_threads: Optional integer.
+        :param http_pool_size: Maximum number of keep-alive connections to the server, defaults to 10
+        :type http_pool_size: Optional integer.
+        :param http_timeout: Timeout in seconds of server calls, defaults to 300
+        :type http_timeout: Optional number.
+        :param upload_cache: Whether to skip uploading data identical to a previous upload, defaults to False
+        :type upload_cache: Optional boolean.
+        :param incremental_uploads: Whether replots only changing visual bindings skip re-uploading the data, defaults to False
+        :type incremental_uploads: Optional boolean.
+        :param cypher_cache: Whether to reuse the results of recent identical cypher() queries, defaults to False
+        :type cypher_cache: Optional boolean.
+        :param plot_memo: Whether to reuse recent encodings of the same data, defaults to False
+        :type plot_memo: Optional boolean.
         :returns: None.
         :rtype: None.
 
@@ -194,6 +365,13 @@ class PyGraphistry(object):
                     graphistry.register('my api key', server='staging', protocol='https')
 
 
+        **Example: Faster uploads on a fast network**
+                ::
+
+                    import graphistry
+                    graphistry.register('my api key', compression_level='auto', compression_threads=8)
+
+
         **Example: Through environment variable**
                 ::
                     export GRAPHISTRY_API_KEY = 'my api key'
@@ -206,19 +384,31 @@ class PyGraphistry(object):
         PyGraphistry.api_version(api)
         PyGraphistry.protocol(protocol)
         PyGraphistry.certificate_validation(certificate_validation)
+        PyGraphistry.compression_level(compression_level)
+        PyGraphistry.compression_threads(compression_threads)
+        PyGraphistry.http_pool_size(http_pool_size)
+        PyGraphistry.http_timeout(http_timeout)
+        PyGraphistry.upload_cache(upload_cache)
+        PyGraphistry.incremental_uploads(incremental_uploads)
+        PyGraphistry.cypher_cache(cypher_cache)
+        PyGraphistry.plot_memo(plot_memo)
         PyGraphistry.authenticate()
         PyGraphistry.set_bolt_driver(bolt)
 
 
     @staticmethod
-    def hypergraph(raw_events, entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False, verbose=True):
+    def hypergraph(raw_events, entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False, verbose=True,
+                   normalize_edges=False, integer_ids=False, workers=None):
         """Transform a dataframe into a hypergraph.
 
-        :param Dataframe raw_events: Dataframe to transform
+        :param Dataframe raw_events: Dataframe to transform, or an iterable of dataframe chunks with the same columns and dtypes, such as pandas.read_csv(..., chunksize=...)
         :param List entity_types: Optional list of columns (strings) to turn into nodes, None signifies all
         :param Dict opts: See below
         :param bool drop_edge_attrs: Whether to include each row's attributes on its edges, defaults to False (include)
         :param bool verbose: Whether to print size information
+        :param bool normalize_edges: Whether to keep each row's attributes only on its event node, instead of copying them onto its edges once per entity column, defaults to False. Edges are the same as with the attributes included, and reference their event by EventID. So with drop_na, like with drop_edge_attrs=False, events missing a value in any column get no edges at all, and a warning counts them. Use drop_edge_attrs=True instead to only drop the edges of missing values.
+        :param bool integer_ids: Whether to number nodes 0..#nodes-1 and use these numbers as node ids in 'nodes' and 'edges', keeping the string ids in a 'nodeStringID' column, defaults to False. Plotting the result then skips hashing node ids again.
+        :param int workers: Number of processes transforming entity columns in parallel, defaults to 1. Requires Python 3.7+ on a platform supporting fork(), otherwise columns are transformed sequentially. Workers are forked from the calling process: forking while other threads run (eg. ``plot_async()`` uploads) may deadlock, and Python 3.12+ warns about it, so only use workers from processes without such threads.
 
         Create a graph out of the dataframe, and return the graph components as dataframes, 
         and the renderable result Plotter. It reveals relationships between the rows and between column values.
@@ -259,9 +449,44 @@ class PyGraphistry(object):
                 h = graphistry.hypergraph(my_df)
                 g = h['graph'].plot()
 
+        **Example: Large event tables**
+
+            ::
+
+                import graphistry
+                h = graphistry.hypergraph(my_df, normalize_edges=True, integer_ids=True, workers=8)
+                g = h['graph'].plot()
+
         """
         from . import hyper
-        return hyper.Hypergraph().hypergraph(PyGraphistry, raw_events, entity_types, opts, drop_na, drop_edge_attrs, verbose)
+        return hyper.Hypergraph().hypergraph(PyGraphistry, raw_events, entity_types, opts, drop_na, drop_edge_attrs, verbose,
+                                             normalize_edges, integer_ids, workers)
+
+
+    @staticmethod
+    def hypergraph_builder(entity_types=None, opts={}, drop_na=True, drop_edge_attrs=False,
+                           normalize_edges=False, integer_ids=False, workers=None):
+        """Incrementally transform chunks of events into a hypergraph.
+
+        Takes the same options as ``hypergraph()``. Chunks are added with ``add(chunk)`` as they arrive, and ``build()`` returns the same result as ``hypergraph()`` on all the events at once. Chunks must have the same columns and dtypes. Each chunk is transformed when added, so the raw events never have to be in memory all at once. With ``workers``, worker processes are forked for each chunk, so that they share it instead of receiving copies: chunks should be large enough for this to pay off.
+
+        :returns: Builder with methods ``add(Dataframe)``, which returns the builder, and ``build(verbose=True)``, which returns {'entities': DF, 'events': DF, 'edges': DF, 'nodes': DF, 'graph': Plotter}.
+        :rtype: HypergraphBuilder
+
+        **Example**
+
+            ::
+
+                import graphistry
+                builder = graphistry.hypergraph_builder(['src_ip', 'dest_ip'], normalize_edges=True)
+                for path in hourly_exports:
+                    builder.add(pandas.read_csv(path))
+                g = builder.build()['graph'].plot()
+
+        """
+        from . import hyper
+        return hyper.HypergraphBuilder(PyGraphistry, entity_types, opts, drop_na, drop_edge_attrs,
+                                       normalize_edges, integer_ids, workers)
 
 
     @staticmethod
@@ -294,11 +519,13 @@ class PyGraphistry(object):
 
 
     @staticmethod
-    def cypher(query, params = {}):
+    def cypher(query, params = {}, partitions=None, sparse=False):
         """
 
         :param query: a cypher query
         :param params: cypher query arguments
+        :param partitions: Optional number of partitions of the query to run concurrently, each on its own session. Every run gets the extra parameters 'partition' (from 0 to partitions - 1) and 'partitions', which the query uses to select its share of the data. Results are merged, keeping nodes and relationships once per id.
+        :param sparse: Whether to store the properties missing from some nodes or edges in sparse columns (pandas.SparseDtype), which only hold the values present. This saves memory and encoding time on graphs mixing many labels with different properties. Requires pandas 0.24 or later.
         :return: Plotter with data from a cypher query. This call binds `source`, `destination`, and `node`.
 
         Call this to immediately execute a cypher query and store the graph in the resulting Plotter.
@@ -307,9 +534,23 @@ class PyGraphistry(object):
 
                     import graphistry
                     g = graphistry.bolt({ query='MATCH (a)-[r:PAYMENT]->(b) WHERE r.USD > 7000 AND r.USD < 10000 RETURN r ORDER BY r.USD DESC', params={ "AccountId": 10 })
+
+        **Example: Partitioned export**
+
+                ::
+
+                    import graphistry
+                    g = graphistry.cypher('MATCH (a)-[r]->(b) WHERE id(r) % $partitions = $partition RETURN a, r, b', partitions=8)
+
+        **Example: Heterogeneous labels**
+
+                ::
+
+                    import graphistry
+                    g = graphistry.cypher('MATCH (a)-[r]->(b) RETURN a, r, b', sparse=True)
         """
         from . import plotter
-        return plotter.Plotter().cypher(query, params)
+        return plotter.Plotter().cypher(query, params, partitions, sparse)
 
 
     @staticmethod
@@ -364,6 +605,83 @@ class PyGraphistry(object):
         return plotter.Plotter().settings(height, url_params, render)
 
 
+    @staticmethod
+    def plot_many(plotters, max_workers=None, upload_workers=None):
+        """Upload many graphs concurrently, and return the visualization URL of each.
+
+        Encoding is CPU bound, so it runs on a pool of processes. Each dataset is then uploaded
+        as soon as it is encoded, on a bounded pool of threads sharing one HTTP connection pool.
+        Plotters are only encoded as long as fewer than max_workers + upload_workers datasets are
+        being encoded or uploaded, which bounds memory when uploads are slower than encoding.
+        A failure does not interrupt the batch: the result of the corresponding plotter is
+        the exception instead of a URL.
+
+        :param plotters: Plotters with their data and bindings already set.
+        :type plotters: List of Plotter.
+        :param max_workers: Number of encoding processes, defaults to the number of CPUs.
+        :type max_workers: Optional integer.
+        :param upload_workers: Number of concurrent uploads, defaults to the HTTP pool size (see ``register()``).
+        :type upload_workers: Optional integer.
+        :returns: One visualization URL or exception per plotter, in the same order.
+        :rtype: List.
+
+        **Example**
+                ::
+
+                    import graphistry
+                    g = graphistry.bind(source='src', destination='dst')
+                    results = graphistry.plot_many([g.edges(df) for df in customer_dfs], max_workers=8)
+                    failed = [r for r in results if isinstance(r, Exception)]
+        """
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+        import multiprocessing
+        from . import plotter
+
+        PyGraphistry.authenticate()
+        api_version = PyGraphistry.api_version()
+        max_workers = max_workers or multiprocessing.cpu_count()
+        upload_workers = upload_workers or PyGraphistry.http_pool_size()
+        # Names are drawn here: forked workers share the state of the random generator.
+        names = [util.random_string(10) for _ in plotters]
+
+        def upload(g, dataset):
+            info = g._plot_upload(dataset, api_version)
+            viz_url = PyGraphistry._viz_url(info, g._url_params)
+            return '%s:%s' % (PyGraphistry._config['protocol'], viz_url)
+
+        def result(future):
+            try:
+                return future.result()
+            except Exception as e:
+                return e
+
+        results = [None] * len(plotters)
+        submitted = 0
+        encoding = {} # future -> plotter index
+        uploading = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as encoders, \
+             ThreadPoolExecutor(max_workers=upload_workers) as uploaders:
+            while True:
+                while submitted < len(plotters) and len(encoding) + len(uploading) < max_workers + upload_workers:
+                    g = plotters[submitted]._without_bolt()
+                    encoding[encoders.submit(plotter._plot_dataset_job, g, names[submitted], api_version)] = submitted
+                    submitted += 1
+                if not encoding and not uploading:
+                    return results
+                # Handle datasets in the order they finish, so slow encodes do not hold back uploads
+                (done, _) = wait(list(encoding) + list(uploading), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in encoding:
+                        i = encoding.pop(future)
+                        dataset = result(future)
+                        if isinstance(dataset, Exception):
+                            results[i] = dataset
+                        else:
+                            uploading[uploaders.submit(upload, plotters[i], dataset)] = i
+                    else:
+                        results[uploading.pop(future)] = result(future)
+
+
     @staticmethod
     def _etl_url():
         hostname = PyGraphistry._config['hostname']
@@ -389,31 +707,122 @@ class PyGraphistry(object):
 
     @staticmethod
     def _get_data_file(dataset, mode):
-        out_file = io.BytesIO()
         if mode == 'json':
             json_dataset = json.dumps(dataset, ensure_ascii=False, cls=NumpyJSONEncoder)
-            with gzip.GzipFile(fileobj=out_file, mode='w', compresslevel=9) as f:
-                if sys.version_info < (3,0) and isinstance(json_dataset, bytes):
-                    f.write(json_dataset)
-                else:
-                    f.write(json_dataset.encode('utf8'))
+            if sys.version_info < (3,0) and isinstance(json_dataset, bytes):
+                chunks = [json_dataset]
+            else:
+                chunks = [json_dataset.encode('utf8')]
         elif mode == 'vgraph':
-            bin_dataset = dataset.SerializeToString()
-            with gzip.GzipFile(fileobj=out_file, mode='w', compresslevel=9) as f:
-                f.write(bin_dataset)
+            # Compress a directly written vgraph piece by piece instead of serializing it whole first
+            if hasattr(dataset, 'iterSerialized'):
+                chunks = dataset.iterSerialized()
+            else:
+                chunks = [dataset.SerializeToString()]
         else:
             raise ValueError('Unknown mode:', mode)
 
-        size = old_div(len(out_file.getvalue()), 1024)
+        level = PyGraphistry.compression_level()
+        if level == 'auto':
+            # Only the first chunks are needed to pick a level, so the rest is still streamed
+            chunks = iter(chunks)
+            head = compress.head(chunks, max(compress.auto_min_size, compress.auto_sample_size))
+            level = compress.resolve_level(level, sum(len(chunk) for chunk in head), compress.sample(head),
+                                           PyGraphistry._upload_bandwidth)
+            chunks = itertools.chain(head, chunks)
+
+        out_file = tempfile.SpooledTemporaryFile(max_size=PyGraphistry._spool_max_size)
+        threads = PyGraphistry.compression_threads()
+        if threads > 1:
+            compress.parallel_gzip(chunks, out_file, level, threads)
+        else:
+            with gzip.GzipFile(fileobj=out_file, mode='w', compresslevel=level) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+
+        size = old_div(out_file.tell(), 1024)
         if size >= 5 * 1024:
             print('Uploading %d kB. This may take a while...' % size)
             sys.stdout.flush()
         elif size > 50 * 1024:
             util.error('Dataset is too large (%d kB)!' % size)
 
+        out_file.seek(0)
         return out_file
 
 
+    # Persistent session, so that successive server calls reuse keep-alive connections
+    # instead of paying for a new TCP and TLS handshake each.
+    @staticmethod
+    def _http():
+        if PyGraphistry._session is None:
+            pool_size = PyGraphistry.http_pool_size()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            PyGraphistry._session = session
+        return PyGraphistry._session
+
+
+    @staticmethod
+    def _upload_cache():
+        if not PyGraphistry.upload_cache():
+            return None
+        return cache.DiskCache(PyGraphistry._config['upload_cache_dir'],
+                               PyGraphistry._config['upload_cache_max_entries'],
+                               PyGraphistry._config['upload_cache_max_age'])
+
+
+    @staticmethod
+    def _cypher_cache():
+        if not PyGraphistry.cypher_cache():
+            return None
+        max_size = PyGraphistry._config['cypher_cache_max_size']
+        max_age = PyGraphistry._config['cypher_cache_max_age']
+        if PyGraphistry._cypher_results is None:
+            PyGraphistry._cypher_results = cache.MemoryCache(max_size, max_age)
+        PyGraphistry._cypher_results.max_size = max_size
+        PyGraphistry._cypher_results.max_age = max_age
+        return PyGraphistry._cypher_results
+
+
+    @staticmethod
+    def _plot_memo():
+        if not PyGraphistry.plot_memo():
+            return None
+        max_size = PyGraphistry._config['plot_memo_max_size']
+        max_age = PyGraphistry._config['plot_memo_max_age']
+        if PyGraphistry._plot_datasets is None:
+            PyGraphistry._plot_datasets = cache.MemoryCache(max_size, max_age)
+        PyGraphistry._plot_datasets.max_size = max_size
+        PyGraphistry._plot_datasets.max_age = max_age
+        return PyGraphistry._plot_datasets
+
+
+    # Uploaded vgraph data, by server and content (see Plotter._plot_upload). Entries take a size of 1.
+    @staticmethod
+    def _uploaded_data():
+        if PyGraphistry._uploaded is None:
+            PyGraphistry._uploaded = cache.MemoryCache(PyGraphistry._uploaded_max_entries, float('inf'))
+        return PyGraphistry._uploaded
+
+
+    @staticmethod
+    def _plot_executor():
+        if PyGraphistry._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            PyGraphistry._executor = ThreadPoolExecutor(max_workers=PyGraphistry.http_pool_size())
+        return PyGraphistry._executor
+
+
+    @staticmethod
+    def _record_upload(out_file, elapsed):
+        out_file.seek(0, os.SEEK_END)
+        PyGraphistry._upload_bandwidth = \
+            compress.update_bandwidth(PyGraphistry._upload_bandwidth, out_file.tell(), elapsed)
+
+
     @staticmethod
     def _etl1(dataset):
         PyGraphistry.authenticate()
@@ -423,10 +832,13 @@ class PyGraphistry(object):
                   'agentversion': sys.modules['graphistry'].__version__,
                   'key': PyGraphistry.api_key()}
 
-        out_file = PyGraphistry._get_data_file(dataset, 'json')
-        response = requests.post(PyGraphistry._etl_url(), out_file.getvalue(),
-                                 headers=headers, params=params,
-                                 verify=PyGraphistry._config['certificate_validation'])
+        with PyGraphistry._get_data_file(dataset, 'json') as out_file:
+            start = time.time()
+            response = PyGraphistry._http().post(PyGraphistry._etl_url(), util.StreamedBody([out_file]),
+                                                 headers=headers, params=params,
+                                                 timeout=PyGraphistry.http_timeout(),
+                                                 verify=PyGraphistry._config['certificate_validation'])
+            PyGraphistry._record_upload(out_file, time.time() - start)
         response.raise_for_status()
 
         jres = response.json()
@@ -436,21 +848,24 @@ class PyGraphistry(object):
             return {'name': jres['dataset'], 'viztoken': jres['viztoken'], 'type': 'vgraph'}
 
 
+    # Upload a vgraph dataset. Given the name of a dataset previously uploaded with the same
+    # vgraph data (data_from), only the metadata is sent and the server reuses that data. Servers
+    # unaware of metadata-only updates may ignore the datasource and accept a dataset without data,
+    # so these updates fail unless the server confirms the reuse.
     @staticmethod
-    def _etl2(dataset):
+    def _etl2(dataset, data_from=None):
         PyGraphistry.authenticate()
 
         vg = dataset['vgraph']
         encodings = dataset['encodings']
         attributes = dataset['attributes']
+        if data_from is None:
+            datasource = {'type': 'vgraph', 'url': 'data0'}
+        else:
+            datasource = {'type': 'vgraph', 'dataset': data_from}
         metadata = {
             'name': dataset['name'],
-            'datasources': [
-                {
-                    'type': 'vgraph',
-                    'url': 'data0'
-                }
-            ],
+            'datasources': [datasource],
             'nodes': [
                 {
                     'count': vg.vertexCount,
@@ -467,33 +882,51 @@ class PyGraphistry(object):
             ]
         }
 
-        out_file = PyGraphistry._get_data_file(vg, 'vgraph')
         metadata_json = json.dumps(metadata, ensure_ascii=False, cls=NumpyJSONEncoder)
-        parts = {
-            'metadata': ('metadata', metadata_json, 'application/json'),
-            'data0': ('data0', out_file.getvalue(), 'application/octet-stream')
-        }
-
         params = {'usertag': PyGraphistry._tag, 'agent': 'pygraphistry', 'apiversion' : '2',
                   'agentversion': sys.modules['graphistry'].__version__,
                   'key': PyGraphistry.api_key()}
-        response = requests.post(PyGraphistry._etl_url(), files=parts, params=params,
-                                 verify=PyGraphistry._config['certificate_validation'])
+
+        if data_from is not None:
+            parts = {'metadata': ('metadata', metadata_json, 'application/json')}
+            response = PyGraphistry._post_multipart(parts, params)
+        else:
+            with PyGraphistry._get_data_file(vg, 'vgraph') as out_file:
+                parts = {
+                    'metadata': ('metadata', metadata_json, 'application/json'),
+                    'data0': ('data0', out_file, 'application/octet-stream')
+                }
+                start = time.time()
+                response = PyGraphistry._post_multipart(parts, params)
+                PyGraphistry._record_upload(out_file, time.time() - start)
         response.raise_for_status()
 
         jres = response.json()
         if jres['success'] is not True:
             raise ValueError('Server reported error:', jres['msg'] if 'msg' in jres else 'No Message')
+        elif data_from is not None and jres.get('reused') != data_from:
+            raise ValueError('Server did not confirm reusing the data of dataset %s' % data_from)
         else:
             return {'name': jres['dataset'], 'viztoken': jres['viztoken'], 'type': 'jsonMeta'}
 
 
+    # Post a multipart/form-data request to the ETL endpoint. The body is streamed from the
+    # parts, so the (compressed) data file is not read back into memory.
+    @staticmethod
+    def _post_multipart(parts, params):
+        body = util.MultipartBody(parts)
+        return PyGraphistry._http().post(PyGraphistry._etl_url(), data=body, params=params,
+                                         headers={'Content-Type': body.content_type},
+                                         timeout=PyGraphistry.http_timeout(),
+                                         verify=PyGraphistry._config['certificate_validation'])
+
+
     @staticmethod
     def _check_key_and_version():
         params = {'text': PyGraphistry.api_key()}
         try:
-            response = requests.get(PyGraphistry._check_url(), params=params, timeout=(3,3),
-                                    verify=PyGraphistry._config['certificate_validation'])
+            response = PyGraphistry._http().get(PyGraphistry._check_url(), params=params, timeout=(3,3),
+                                                verify=PyGraphistry._config['certificate_validation'])
             response.raise_for_status()
             jres = response.json()
 
@@ -518,8 +951,10 @@ nodes = PyGraphistry.nodes
 graph = PyGraphistry.graph
 settings = PyGraphistry.settings
 hypergraph = PyGraphistry.hypergraph
+hypergraph_builder = PyGraphistry.hypergraph_builder
 bolt = PyGraphistry.bolt
 cypher = PyGraphistry.cypher
+plot_many = PyGraphistry.plot_many
 
 
 class NumpyJSONEncoder(json.JSONEncoder):
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+import pandas as pd
+import graphistry
+from graphistry import bolt_util
+from graphistry.pygraphistry import PyGraphistry
+from mock import patch
+from common import NoAuthTestCase
+
+
+class FakeNode(object):
+    def __init__(self, id, labels=(), **properties):
+        self.id = id
+        self.labels = set(labels)
+        self.properties = properties
+    def items(self):
+        return self.properties.items()
+
+
+class FakeRelationship(object):
+    def __init__(self, id, start_node, end_node, type='LINK', **properties):
+        self.id = id
+        self.start_node = start_node
+        self.end_node = end_node
+        self.type = type
+        self.properties = properties
+    def items(self):
+        return self.properties.items()
+
+
+class FakePath(object):
+    def __init__(self, nodes, relationships):
+        self.nodes = nodes
+        self.relationships = relationships
+
+
+class FakeGraph(object):
+    def __init__(self, nodes, relationships):
+        self.nodes = nodes
+        self.relationships = relationships
+
+
+# In-process stand-in for a neo4j driver, whose sessions return the given records,
+# or the records returned by records(params)
+class FakeDriver(object):
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession(object):
+    def __init__(self, driver):
+        self.driver = driver
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        pass
+    def run(self, query, **params):
+        self.driver.queries.append((query, params))
+        records = self.driver.records
+        return iter(records(params) if callable(records) else records)
+
+
+a = FakeNode(1, ['Person'], name='a', age=30)
+b = FakeNode(2, ['Person'], name='b')
+c = FakeNode(3, ['City'], city='Paris')
+ab = FakeRelationship(10, a, b, weight=0.5)
+bc = FakeRelationship(11, b, c)
+
+
+class TestBoltUtil(unittest.TestCase):
+
+    def test_graph_to_dataframes(self):
+        graph = FakeGraph([a, b, c], [ab, bc])
+        nodes = bolt_util.bolt_graph_to_nodes_dataframe(graph)
+        edges = bolt_util.bolt_graph_to_edges_dataframe(graph)
+
+        expected_nodes = pd.DataFrame([
+            {'name': 'a', 'age': 30, '_bolt_node_id_key': 1},
+            {'name': 'b', '_bolt_node_id_key': 2},
+            {'city': 'Paris', '_bolt_node_id_key': 3}])
+        pd.testing.assert_frame_equal(nodes.sort_index(axis=1), expected_nodes.sort_index(axis=1))
+        self.assertEqual(edges['weight'].tolist()[0], 0.5)
+        self.assertTrue(pd.isnull(edges['weight'].tolist()[1]))
+        self.assertEqual(edges['_bolt_start_node_id_key'].tolist(), [1, 2])
+        self.assertEqual(edges['_bolt_end_node_id_key'].tolist(), [2, 3])
+
+    def test_records_to_dataframes(self):
+        records = [(a, ab, b), (FakePath([b, c], [bc]), [ab, bc]), (c, 'not a graph value')]
+        (edges, nodes) = bolt_util.bolt_records_to_dataframes(records)
+        self.assertEqual(edges['_bolt_relationship_id'].tolist(), [10, 11])
+        self.assertEqual(nodes['_bolt_node_id_key'].tolist(), [1, 2, 3])
+        self.assertEqual(nodes['name'].tolist()[:2], ['a', 'b'])
+
+    def test_nested_maps(self):
+        records = [({'n': a, 'rels': [ab], 'more': {'path': FakePath([b, c], [bc])}}, {'name': 'a'})]
+        (edges, nodes) = bolt_util.bolt_records_to_dataframes(records)
+        self.assertEqual(edges['_bolt_relationship_id'].tolist(), [10, 11])
+        self.assertEqual(nodes['_bolt_node_id_key'].tolist(), [1, 2, 3])
+        self.assertEqual(nodes['name'].tolist()[:2], ['a', 'b'])
+
+    def test_sparse_columns(self):
+        (edges, nodes) = bolt_util.bolt_records_to_dataframes([(a, ab, b), (c,)], sparse=True)
+        self.assertEqual(str(nodes['name'].dtype), 'Sparse[object, nan]')
+        self.assertEqual(str(nodes['age'].dtype), 'Sparse[float64, nan]')
+        self.assertEqual(nodes['_bolt_node_id_key'].dtype.name, 'int64')
+        self.assertEqual(nodes['name'].sparse.npoints, 2)
+        self.assertEqual(nodes['name'].tolist()[:2], ['a', 'b'])
+        self.assertEqual(edges['weight'].dtype.name, 'float64')
+
+    def test_endpoint_nodes(self):
+        (edges, nodes) = bolt_util.bolt_records_to_dataframes([(ab,)])
+        self.assertEqual(len(edges), 1)
+        self.assertEqual(nodes['_bolt_node_id_key'].tolist(), [1, 2])
+        self.assertEqual(list(nodes.columns), ['_bolt_node_id_key'])
+
+
+@patch.object(bolt_util, 'to_bolt_driver', side_effect=lambda driver: driver)
+class TestCypher(NoAuthTestCase):
+
+    def test_cypher(self, mock_to_bolt_driver):
+        driver = FakeDriver([(a, ab, b), (b, bc, c)])
+        g = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'limit': 10})
+        self.assertEqual(driver.queries, [('MATCH (a)-[r]->(b) RETURN a, r, b', {'limit': 10})])
+        self.assertEqual(len(g._nodes), 3)
+        self.assertEqual(len(g._edges), 2)
+        self.assertEqual(g._source, '_bolt_start_node_id_key')
+        ds = g.plot(skip_upload=True)
+        self.assertEqual(ds['vgraph'].edgeCount, 2)
+
+    def test_partitions(self, mock_to_bolt_driver):
+        # Partition 0 only sees b as the end of a relationship, partition 1 sees its properties
+        records = {0: [(a, ab)], 1: [(b, bc, c), (ab,)]}
+        driver = FakeDriver(lambda params: records[params['partition']])
+        g = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'limit': 10}, partitions=2)
+
+        self.assertEqual(sorted(p['partition'] for (_, p) in driver.queries), [0, 1])
+        self.assertTrue(all(p['partitions'] == 2 and p['limit'] == 10 for (_, p) in driver.queries))
+        self.assertEqual(g._edges['_bolt_relationship_id'].tolist(), [10, 11])
+        nodes = g._nodes.set_index('_bolt_node_id_key')
+        self.assertEqual(sorted(nodes.index), [1, 2, 3])
+        self.assertEqual(nodes.loc[2, 'name'], 'b')
+        self.assertEqual(nodes.loc[3, 'city'], 'Paris')
+
+    def test_cache(self, mock_to_bolt_driver):
+        driver = FakeDriver([(a, ab, b)])
+        with patch.dict(PyGraphistry._config, {'cypher_cache': True}):
+            g1 = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'x': 1, 'y': [2]})
+            g2 = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'y': [2], 'x': 1})
+            graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'x': 2, 'y': [2]})
+            graphistry.bind().bolt(FakeDriver([])).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', {'x': 1, 'y': [2]})
+            PyGraphistry.cypher_cache(False)
+        self.assertEqual(len(driver.queries), 2)
+        self.assertIs(g1._edges, g2._edges)
+        self.assertIs(g1._nodes, g2._nodes)
+        self.assertIsNone(PyGraphistry._cypher_results)
+
+    def test_cache_array_params(self, mock_to_bolt_driver):
+        driver = FakeDriver([(a, ab, b)])
+        ids = np.arange(5000)
+        changed = ids.copy()
+        changed[2500] = -1
+        with patch.dict(PyGraphistry._config, {'cypher_cache': True}):
+            g = graphistry.bind().bolt(driver)
+            g.cypher('MATCH (a) WHERE id(a) IN $ids RETURN a', {'ids': ids})
+            g.cypher('MATCH (a) WHERE id(a) IN $ids RETURN a', {'ids': changed})
+            g.cypher('MATCH (a) WHERE id(a) IN $ids RETURN a', {'ids': object()})
+            g.cypher('MATCH (a) WHERE id(a) IN $ids RETURN a', {'ids': object()})
+            PyGraphistry.cypher_cache(False)
+        self.assertEqual(len(driver.queries), 4)
+
+    def test_expand(self, mock_to_bolt_driver):
+        d = FakeNode(4, ['City'], city='Lyon')
+        cd = FakeRelationship(12, c, d)
+        neighbors = {1: [(a, ab, b)], 2: [(b, ab, a), (b, bc, c)], 3: [(c, bc, b), (c, cd, d)]}
+        driver = FakeDriver(lambda params: [r for seed in params.get('ids', []) for r in neighbors[seed]] or [(a,)])
+        query = 'UNWIND $ids AS seed MATCH (a)-[r]-(b) WHERE id(a) = seed RETURN a, r, b'
+
+        g1 = graphistry.bind().bolt(driver).cypher('MATCH (a) WHERE id(a) = 1 RETURN a')
+        g2 = g1.expand_cypher(query, seeds_param='ids', params={'limit': 5})
+        g3 = g2.expand_cypher(query, seeds=pd.Series([3]), seeds_param='ids')
+
+        self.assertEqual(driver.queries[1], (query, {'ids': [1], 'limit': 5}))
+        self.assertEqual(driver.queries[2], (query, {'ids': [3]}))
+        self.assertEqual(g2._nodes['_bolt_node_id_key'].tolist(), [1, 2])
+        self.assertEqual(g3._nodes['_bolt_node_id_key'].tolist(), [1, 2, 3, 4])
+        self.assertEqual(g3._nodes['city'].tolist()[2:], ['Paris', 'Lyon'])
+        self.assertEqual(g3._edges['_bolt_relationship_id'].tolist(), [10, 11, 12])
+        self.assertEqual(len(g1._nodes), 1)
+        self.assertEqual(len(g2._edges), 1)
+        self.assertEqual(g3._node, '_bolt_node_id_key')
+
+    def test_expand_without_new(self, mock_to_bolt_driver):
+        driver = FakeDriver([(a, ab, b)])
+        g1 = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b')
+        g2 = g1.expand_cypher('UNWIND $seeds AS seed MATCH (a)-[r]-(b) WHERE id(a) = seed RETURN a, r, b')
+        self.assertEqual(driver.queries[1][1], {'seeds': [1, 2]})
+        self.assertIs(g2._nodes, g1._nodes)
+        self.assertIs(g2._edges, g1._edges)
+
+    def test_sparse(self, mock_to_bolt_driver):
+        records = {0: [(a, ab)], 1: [(b, bc, c), (ab,)]}
+        driver = FakeDriver(lambda params: records[params['partition']])
+        g = graphistry.bind().bolt(driver).cypher('MATCH (a)-[r]->(b) RETURN a, r, b', partitions=2, sparse=True)
+        nodes = g._nodes.set_index('_bolt_node_id_key')
+        self.assertEqual(nodes.loc[2, 'name'], 'b')
+        self.assertTrue(pd.isnull(nodes.loc[3, 'name']))
+        ds = g.plot(skip_upload=True)
+        self.assertEqual(ds['vgraph'].vertexCount, 3)
+        self.assertEqual(ds['attributes']['nodes']['city']['aggregations']['distinct'], 2)
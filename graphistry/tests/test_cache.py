@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy
+import pandas
+import graphistry
+from graphistry import cache
+from graphistry.pygraphistry import PyGraphistry
+from mock import patch
+from common import NoAuthTestCase
+
+
+triangleEdges = pandas.DataFrame({'src': ['a', 'b', 'c'], 'dst': ['b', 'c', 'a']})
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_get_put(self):
+        c = cache.DiskCache(self.path, 10, 60)
+        self.assertIsNone(c.get('k'))
+        c.put('k', {'name': 'n'})
+        self.assertEqual(c.get('k'), {'name': 'n'})
+        self.assertEqual(cache.DiskCache(self.path, 10, 60).get('k'), {'name': 'n'})
+
+    def test_max_entries(self):
+        c = cache.DiskCache(self.path, 2, 60)
+        for (i, key) in enumerate(['a', 'b', 'c']):
+            c.put(key, i)
+            os.utime(os.path.join(self.path, key + '.json'), (i, time.time() - 10 + i))
+        c.evict()
+        self.assertIsNone(c.get('a'))
+        self.assertEqual([c.get('b'), c.get('c')], [1, 2])
+
+    def test_leftover_tmp_files(self):
+        c = cache.DiskCache(self.path, 10, 60)
+        for name in ['stale.tmp', 'writing.tmp']:
+            open(os.path.join(self.path, name), 'w').close()
+        os.utime(os.path.join(self.path, 'stale.tmp'), (0, time.time() - cache.DiskCache.tmp_max_age - 1))
+        c.put('k', 1)
+        self.assertEqual(sorted(os.listdir(self.path)), ['k.json', 'writing.tmp'])
+
+    def test_max_age(self):
+        c = cache.DiskCache(self.path, 10, -1)
+        c.put('k', 1)
+        self.assertIsNone(c.get('k'))
+
+    def test_frame_digest(self):
+        df = pandas.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+        self.assertEqual(cache.frame_digest(df), cache.frame_digest(df.copy()))
+        self.assertNotEqual(cache.frame_digest(df), cache.frame_digest(df.assign(b=['x', 'z'])))
+        self.assertNotEqual(cache.frame_digest(df), cache.frame_digest(df.rename(columns={'b': 'c'})))
+
+
+class TestDigest(unittest.TestCase):
+
+    def test_arrays(self):
+        ids = numpy.arange(5000)
+        changed = ids.copy()
+        changed[2500] = -1
+        self.assertNotEqual(cache.digest({'ids': ids}), cache.digest({'ids': changed}))
+        self.assertEqual(cache.digest({'ids': ids}), cache.digest({'ids': pandas.Series(ids)}))
+        self.assertEqual(cache.digest([numpy.int64(3)]), cache.digest([3]))
+
+    def test_other_values(self):
+        day = datetime.date(2018, 1, 1)
+        self.assertNotEqual(cache.digest([day]), cache.digest([str(day)]))
+        self.assertEqual(cache.digest([day]), cache.digest([datetime.date(2018, 1, 1)]))
+        self.assertIsNone(cache.digest([object()]))
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_get_put(self):
+        driver = object()
+        c = cache.MemoryCache(100, 60)
+        c.put('k', [driver], 'v', 10)
+        self.assertEqual(c.get('k', [driver]), 'v')
+        self.assertIsNone(c.get('k', [object()]))
+        self.assertIsNone(c.get('other', [driver]))
+
+    def test_max_size(self):
+        c = cache.MemoryCache(100, 60)
+        for (i, key) in enumerate(['a', 'b', 'c']):
+            c.put(key, [], i, 40)
+        self.assertIsNone(c.get('a', []))
+        self.assertEqual([c.get('b', []), c.get('c', [])], [1, 2])
+        self.assertEqual(c.size, 80)
+        c.put('huge', [], 3, 1000)
+        self.assertIsNone(c.get('huge', []))
+
+    def test_max_age(self):
+        c = cache.MemoryCache(100, -1)
+        c.put('k', [], 1, 10)
+        self.assertIsNone(c.get('k', []))
+        self.assertEqual(c.size, 0)
+
+    def test_expired_entries_released(self):
+        c = cache.MemoryCache(100, 60)
+        c.put('old', [], 1, 10)
+        c.max_age = -1
+        c.put('new', [], 2, 20)
+        self.assertEqual(c.size, 20)
+        self.assertEqual(list(c._entries.keys()), ['new'])
+
+
+@patch('webbrowser.open')
+@patch.object(PyGraphistry, '_etl2', return_value={'name': 'dsname', 'viztoken': 'tok', 'type': 'jsonMeta'})
+class TestUploadCache(NoAuthTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.config = patch.dict(PyGraphistry._config, {'upload_cache': True, 'upload_cache_dir': self.path})
+        self.config.start()
+
+    def tearDown(self):
+        self.config.stop()
+        shutil.rmtree(self.path)
+
+    def test_hit(self, mock_etl2, mock_open):
+        g = graphistry.bind(source='src', destination='dst')
+        url1 = g.plot(triangleEdges)
+        url2 = g.settings(height=800).plot(triangleEdges.copy())
+        self.assertEqual(mock_etl2.call_count, 1)
+        self.assertEqual(url1.split('&splashAfter')[0], url2.split('&splashAfter')[0])
+
+    def test_miss(self, mock_etl2, mock_open):
+        g = graphistry.bind(source='src', destination='dst')
+        g.plot(triangleEdges)
+        g.bind(edge_title='src').plot(triangleEdges)
+        g.plot(triangleEdges.assign(dst=['c', 'a', 'b']))
+        self.assertEqual(mock_etl2.call_count, 3)
+
+    def test_disabled(self, mock_etl2, mock_open):
+        PyGraphistry.upload_cache(False)
+        g = graphistry.bind(source='src', destination='dst')
+        g.plot(triangleEdges)
+        g.plot(triangleEdges)
+        self.assertEqual(mock_etl2.call_count, 2)
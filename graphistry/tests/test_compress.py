@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import gzip
+import io
+from graphistry import compress
+from graphistry.pygraphistry import PyGraphistry
+from mock import patch
+
+
+class TestCompressionLevel(unittest.TestCase):
+
+    def test_check_level(self):
+        self.assertEqual(compress.check_level(1), 1)
+        self.assertEqual(compress.check_level('7'), 7)
+        self.assertEqual(compress.check_level('auto'), 'auto')
+        for level in [-1, 10, 'fast']:
+            with self.assertRaises(ValueError):
+                compress.check_level(level)
+
+    def test_resolve_fixed_level(self):
+        self.assertEqual(compress.resolve_level(3, 10**9, b'abc'), 3)
+
+    def test_resolve_auto_small_payload(self):
+        self.assertEqual(compress.resolve_level('auto', 100, b'x' * 100), compress.default_level)
+
+    def test_resolve_auto_large_payload(self):
+        sample = b''.join([str(i).encode('utf8') for i in range(50000)])
+        level = compress.resolve_level('auto', 10**9, sample, bandwidth=10**12)
+        self.assertEqual(level, min(compress.auto_levels))
+
+    def test_head(self):
+        chunks = iter([b'abc', b'def', b'ghi'])
+        self.assertEqual(compress.head(chunks, 4), [b'abc', b'def'])
+        self.assertEqual(list(chunks), [b'ghi'])
+
+    def test_sample(self):
+        self.assertEqual(compress.sample([b'abc', b'def', b'ghi'], 5), b'abcde')
+        self.assertEqual(compress.sample([b'ab'], 5), b'ab')
+
+
+class TestDataFileLevel(unittest.TestCase):
+
+    def test_levels(self):
+        dataset = {'values': list(range(10000))}
+        sizes = []
+        for level in [0, 9, 'auto']:
+            with patch.dict(PyGraphistry._config, {'compression_level': level}):
+                with PyGraphistry._get_data_file(dataset, 'json') as out_file:
+                    self.assertIn(b'9999', gzip.GzipFile(fileobj=out_file, mode='rb').read())
+                    sizes.append(out_file.tell())
+        self.assertGreater(sizes[0], sizes[1])
+
+    def test_register(self):
+        with patch.dict(PyGraphistry._config, {}):
+            PyGraphistry.compression_level('auto')
+            self.assertEqual(PyGraphistry.compression_level(), 'auto')
+            with self.assertRaises(ValueError):
+                PyGraphistry.compression_level(11)
+
+
+class TestParallelGzip(unittest.TestCase):
+
+    def test_single_gzip_stream(self):
+        data = b''.join([str(i).encode('utf8') for i in range(200000)])
+        chunks = [data[:1000], data[1000:500000], data[500000:]]
+        for level in [0, 1, 6, 9]:
+            out_file = io.BytesIO()
+            compress.parallel_gzip(chunks, out_file, level, 4, block_size=64 * 1024)
+            self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(out_file.getvalue())).read(), data)
+
+    def test_empty(self):
+        out_file = io.BytesIO()
+        compress.parallel_gzip([], out_file, 6, 4)
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(out_file.getvalue())).read(), b'')
+
+    def test_blocks(self):
+        self.assertEqual(list(compress.blocks([b'abc', b'defgh', b'i'], 4)), [b'abcd', b'efgh', b'i'])
+
+    def test_data_file(self):
+        dataset = {'values': list(range(100000))}
+        with patch.dict(PyGraphistry._config, {'compression_threads': 4}):
+            with patch.object(compress, 'parallel_block_size', 4096):
+                with PyGraphistry._get_data_file(dataset, 'json') as out_file:
+                    self.assertIn(b'99999', gzip.GzipFile(fileobj=out_file, mode='rb').read())
@@ -73,3 +73,150 @@ class TestHypergraphPlain(NoAuthTestCase):
         assertFrameEqual(h['edges'], edges)
         for (k, v) in [('entities', 12), ('nodes', 15), ('edges', 12), ('events', 3)]:
             self.assertEqual(len(h[k]), v)
+
+    def test_categories(self, mock_open):
+
+        h = graphistry.hypergraph(triangleNodes, ['id', 'a1'], opts={'CATEGORIES': {'n': ['id', 'a1']}},
+                                  verbose=False, drop_edge_attrs=True)
+
+        edges = pd.DataFrame({
+            'edgeType': ['n'] * 6,
+            'category': ['a1', 'a1', 'a1', 'id', 'id', 'id'],
+            'attribID': ['n::1', 'n::2', 'n::3', 'n::a', 'n::b', 'n::c'],
+            'EventID': ['EventID::0', 'EventID::1', 'EventID::2'] * 2})
+
+        assertFrameEqual(h['edges'], edges)
+
+    def test_event_ids(self, mock_open):
+
+        h = graphistry.hypergraph(triangleNodes.assign(EventID=[10, 'x', 1.5]), ['id'], verbose=False)
+        self.assertEqual(h['events']['EventID'].tolist(), ['EventID::10', 'EventID::x', 'EventID::1.5'])
+
+        h = graphistry.hypergraph(triangleNodes.set_index('a2'), ['id'], verbose=False)
+        self.assertEqual(h['events']['EventID'].tolist(), ['EventID::0', 'EventID::1', 'EventID::2'])
+
+    def test_entities(self, mock_open):
+
+        events = triangleNodes.assign(t=pd.to_datetime([1, 2, 1], unit='s'), f=[0.5, numpy.nan, 0.5])
+        h = graphistry.hypergraph(events, ['a1', 't', 'f'], verbose=False, drop_edge_attrs=True)
+
+        self.assertEqual(h['entities']['nodeID'].tolist(), [
+            'a1::1', 'a1::2', 'a1::3',
+            "t::Timestamp('1970-01-01 00:00:01')", "t::Timestamp('1970-01-01 00:00:02')",
+            'f::0.5'])
+        self.assertEqual(h['entities']['nodeTitle'].tolist()[:3], [1, 2, 3])
+        self.assertEqual(h['entities']['type'].tolist(), ['a1'] * 3 + ['t'] * 2 + ['f'])
+        self.assertTrue(h['edges']['attribID'].isin(h['nodes']['nodeID']).all())
+
+    def test_safe_strs(self, mock_open):
+
+        from graphistry.hyper import valsToSafeStrs, valToSafeStr
+        columns = [pd.Series([1, -2**62]), pd.Series([0.1, numpy.nan, 1e16, -0.0]), pd.Series([True, False]),
+                   pd.Series([0.1], dtype='float32'), pd.Series(['a', u'é']), pd.Series(['a', 1, None, 'a', numpy.nan]), pd.Series([1, 2.5, True, 1.0], dtype=object), pd.Series([0.5, numpy.nan, 0.5], dtype='float32'), pd.Series([None, None]),
+                   pd.Series(pd.to_datetime([1], unit='s')), pd.Series([2**64 - 1], dtype='uint64')]
+        for column in columns:
+            self.assertEqual(valsToSafeStrs(column).tolist(), [valToSafeStr(v) for v in column.astype(object)])
+
+    def test_normalize_edges(self, mock_open):
+
+        events = triangleNodes.assign(a3=[0.5, numpy.nan, 1.5])
+        h1 = graphistry.hypergraph(events, ['id', 'a2'], verbose=False)
+        with patch.object(graphistry.util, 'warn') as mock_warn:
+            h2 = graphistry.hypergraph(events, ['id', 'a2'], verbose=False, normalize_edges=True)
+        self.assertIn('1 events', mock_warn.call_args[0][0])
+
+        self.assertEqual(sorted(h2['edges'].columns), ['EventID', 'attribID', 'edgeType'])
+        assertFrameEqual(h2['edges'], h1['edges'][h2['edges'].columns])
+        self.assertEqual(len(h2['edges']), 4)
+        assertFrameEqual(h2['nodes'], h1['nodes'])
+
+    def test_integer_ids(self, mock_open):
+
+        h1 = graphistry.hypergraph(triangleNodes, verbose=False)
+        h2 = graphistry.hypergraph(triangleNodes, verbose=False, integer_ids=True)
+
+        nodes = h2['nodes']
+        self.assertEqual(nodes['nodeID'].tolist(), list(range(15)))
+        self.assertEqual(sorted(nodes['nodeStringID']), sorted(h1['nodes']['nodeID']))
+        ids = nodes['nodeStringID'].values
+        self.assertEqual(list(zip(ids[h2['edges']['attribID']], ids[h2['edges']['EventID']])),
+                         list(zip(h1['edges']['attribID'], h1['edges']['EventID'])))
+        titles = h1['nodes'].set_index('nodeID')['nodeTitle']
+        self.assertEqual(nodes['nodeTitle'].tolist(), titles[ids].tolist())
+
+        # The fast path encodes the same dataset as sanitizing the data
+        (ds1, ds2) = self.plot_both_paths(h2)
+        self.assertEqual(ds1['encodings'], ds2['encodings'])
+        self.assertEqual(h2['nodes']['nodeStringID'].tolist(), ids.tolist())
+
+    def test_integer_ids_modified(self, mock_open):
+
+        h = graphistry.hypergraph(triangleNodes, verbose=False, integer_ids=True)
+        for (frame, column, values) in [('edges', 'attribID', lambda ids: ids + 100),
+                                        ('edges', 'EventID', lambda ids: ids.astype(str)),
+                                        ('nodes', 'nodeID', lambda ids: ids[::-1].values)]:
+            saved = h[frame][column].copy()
+            h[frame][column] = values(saved)
+            with patch.object(graphistry.plotter.Plotter, '_sanitize_dataset',
+                              side_effect=ValueError('sanitized')) as mock_sanitize:
+                with self.assertRaises(ValueError):
+                    h['graph'].plot(name='n', skip_upload=True)
+                self.assertTrue(mock_sanitize.called)
+            h[frame][column] = saved
+
+    def test_integer_ids_numeric_strings(self, mock_open):
+        events = pd.DataFrame({'a': ['1', '2', '1'], 'b': ['x', 'y', None]})
+        h = graphistry.hypergraph(events, verbose=False, integer_ids=True)
+        nodes = h['nodes'].copy()
+        (ds1, ds2) = self.plot_both_paths(h)
+        self.assertEqual(ds2['attributes']['nodes']['a']['ctype'], ds1['attributes']['nodes']['a']['ctype'])
+        self.assertEqual(ds2['attributes']['nodes']['a']['originalType'], 'float64')
+        assertFrameEqual(h['nodes'], nodes)
+
+    # Plot a hypergraph with integer ids through the generic path, then the fast path, and
+    # check that they encode the same vgraph.
+    def plot_both_paths(self, h):
+        generic = graphistry.bind(source='attribID', destination='EventID', node='nodeID', point_title='nodeTitle')
+        with patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'plot_memo': False}):
+            ds1 = generic.plot(h['edges'], h['nodes'], name='n', skip_upload=True)
+            with patch.object(graphistry.plotter.Plotter, '_sanitize_dataset') as mock_sanitize:
+                ds2 = h['graph'].plot(name='n', skip_upload=True)
+                self.assertFalse(mock_sanitize.called)
+        self.assertEqual(ds1['vgraph'].SerializeToString(), ds2['vgraph'].SerializeToString())
+        return (ds1, ds2)
+
+    def test_chunks(self, mock_open):
+
+        events = pd.concat([triangleNodes] * 3, ignore_index=True).assign(a3=numpy.arange(9) % 4)
+        h1 = graphistry.hypergraph(events, verbose=False)
+        h2 = graphistry.hypergraph((events.iloc[i:i + 4] for i in range(0, 9, 4)), verbose=False)
+        builder = graphistry.hypergraph_builder()
+        for i in range(0, 9, 2):
+            builder.add(events.iloc[i:i + 2])
+        h3 = builder.build(verbose=False)
+
+        for h in [h2, h3]:
+            for k in ['entities', 'events', 'edges', 'nodes']:
+                assertFrameEqual(h1[k], h[k])
+        self.assertEqual(len(h3['entities']), 16)
+        self.assertEqual(h3['events']['EventID'].tolist()[-1], 'EventID::8')
+
+    def test_workers(self, mock_open):
+
+        events = pd.concat([triangleNodes] * 3, ignore_index=True).assign(a3=numpy.arange(9) % 4)
+        for kwargs in [{}, {'normalize_edges': True}]:
+            h1 = graphistry.hypergraph(events, verbose=False, **kwargs)
+            h2 = graphistry.hypergraph((events.iloc[i:i + 4] for i in range(0, 9, 4)), verbose=False, workers=2, **kwargs)
+            for k in ['entities', 'events', 'edges', 'nodes']:
+                assertFrameEqual(h1[k], h2[k])
+
+    def test_workers_errors(self, mock_open):
+
+        import multiprocessing
+        from graphistry import hyper
+        builder = graphistry.hypergraph_builder(workers=2).add(triangleNodes)
+        with patch.object(hyper, 'entity_values', side_effect=ValueError('failed')):
+            with self.assertRaises(ValueError):
+                builder.add(triangleNodes)
+        self.assertIsNone(hyper._worker_state)
+        self.assertEqual(multiprocessing.active_children(), [])
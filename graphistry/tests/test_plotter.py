@@ -2,6 +2,9 @@
 
 from builtins import object
 
+import json
+import sys
+import time
 import unittest
 import pandas
 import requests
@@ -9,6 +12,7 @@ import IPython
 import igraph
 import networkx as nx
 import graphistry
+from graphistry import vgraph
 import datetime as dt
 from mock import patch
 from common import NoAuthTestCase
@@ -123,7 +127,7 @@ class TestPlotterBindings(NoAuthTestCase):
 
 
 @patch('webbrowser.open')
-@patch('requests.post', return_value=Fake_Response())
+@patch('requests.Session.post', return_value=Fake_Response())
 class TestPlotterReturnValue(NoAuthTestCase):
 
     def test_no_ipython(self, mock_post, mock_open):
@@ -140,6 +144,95 @@ class TestPlotterReturnValue(NoAuthTestCase):
         self.assertIsInstance(widget, IPython.core.display.HTML)
 
 
+    def test_pooled_session(self, mock_post, mock_open):
+        PyGraphistry = graphistry.pygraphistry.PyGraphistry
+        session = PyGraphistry._http()
+        graphistry.bind(source='src', destination='dst').plot(triangleEdges)
+        graphistry.bind(source='src', destination='dst').plot(triangleEdges)
+        self.assertIs(PyGraphistry._http(), session)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(mock_post.call_args[1]['timeout'], PyGraphistry.http_timeout())
+
+        with patch.dict(PyGraphistry._config, {}), patch.object(session, 'close') as mock_close:
+            PyGraphistry.http_pool_size(3)
+            mock_close.assert_called_once_with()
+            self.assertIsNot(PyGraphistry._http(), session)
+            self.assertEqual(PyGraphistry._http().get_adapter('https://x')._pool_maxsize, 3)
+
+
+
+@patch('webbrowser.open')
+@patch('requests.Session.post', return_value=Fake_Response())
+class TestPlotterAsync(NoAuthTestCase):
+
+    def test_plot_async(self, mock_post, mock_open):
+        future = graphistry.bind(source='src', destination='dst').plot_async(triangleEdges)
+        url = future.result()
+        self.assertIn('fakedatasetname', url)
+        self.assertTrue(mock_post.called)
+        self.assertFalse(mock_open.called)
+
+
+    def test_plot_async_error(self, mock_post, mock_open):
+        future = graphistry.bind(source='src').plot_async(triangleEdges)
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertFalse(mock_post.called)
+
+
+    @unittest.skipIf(sys.version_info < (3, 4), 'asyncio requires Python 3.4+')
+    def test_plot_asyncio(self, mock_post, mock_open):
+        import asyncio
+        g = graphistry.bind(source='src', destination='dst')
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            urls = loop.run_until_complete(asyncio.gather(g.plot_asyncio(triangleEdges), g.plot_asyncio(triangleEdges)))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertEqual(len(urls), 2)
+        self.assertIn('faketoken', urls[0])
+
+
+
+@patch('requests.Session.post', return_value=Fake_Response())
+class TestPlotMany(NoAuthTestCase):
+
+    def test_plot_many(self, mock_post):
+        g = graphistry.bind(source='src', destination='dst')
+        plotters = [g.edges(triangleEdges), graphistry.bind(source='src').edges(triangleEdges), g.edges(triangleEdges)]
+        results = graphistry.plot_many(plotters, max_workers=2)
+        self.assertEqual(len(results), 3)
+        self.assertIn('fakedatasetname', results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIn('fakedatasetname', results[2])
+        self.assertEqual(mock_post.call_count, 2)
+        names = [call[1]['data'].files['metadata'][1] for call in mock_post.call_args_list]
+        self.assertNotEqual(names[0], names[1])
+
+    def test_bounded_datasets(self, mock_post):
+        from concurrent.futures import ProcessPoolExecutor
+        submit = ProcessPoolExecutor.submit
+        counts = {'encodes': 0, 'uploads': 0, 'max_alive': 0}
+        def counted_submit(executor, *args, **kwargs):
+            counts['encodes'] += 1
+            return submit(executor, *args, **kwargs)
+        def slow_post(*args, **kwargs):
+            counts['max_alive'] = max(counts['max_alive'], counts['encodes'] - counts['uploads'])
+            time.sleep(0.05)
+            counts['uploads'] += 1
+            return Fake_Response()
+        mock_post.side_effect = slow_post
+
+        g = graphistry.bind(source='src', destination='dst')
+        with patch.object(ProcessPoolExecutor, 'submit', autospec=True, side_effect=counted_submit):
+            results = graphistry.plot_many([g.edges(triangleEdges)] * 8, max_workers=1, upload_workers=1)
+        self.assertTrue(all('fakedatasetname' in r for r in results))
+        self.assertEqual(counts['encodes'], 8)
+        self.assertLessEqual(counts['max_alive'], 2)
+
+
 
 @patch('webbrowser.open')
 @patch.object(graphistry.pygraphistry.PyGraphistry, '_etl2')
@@ -163,6 +256,155 @@ class TestPlotterCallChaining(NoAuthTestCase):
         self.assertTrue(mock_etl2.called)
 
 
+@patch('webbrowser.open')
+@patch.object(graphistry.pygraphistry.PyGraphistry, '_etl2')
+@patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'plot_memo': True})
+class TestPlotterMemo(NoAuthTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        graphistry.pygraphistry.PyGraphistry._is_authenticated = True
+        graphistry.register(api=2)
+
+    def setUp(self):
+        graphistry.pygraphistry.PyGraphistry._plot_datasets = None
+
+    def test_reuse_dataset(self, mock_etl2, mock_open):
+        plotter0 = graphistry.bind(source='src', destination='dst', node='id')
+        plotter1 = plotter0.nodes(triangleNodes)
+        with patch.object(vgraph, 'create', wraps=vgraph.create) as mock_create:
+            plotter1.plot(triangleEdges, name='first')
+            plotter1.settings(height=800).bind(point_color='a1').plot(triangleEdges, name='again')
+            self.assertEqual(mock_create.call_count, 1)
+
+        (first, second) = [args[0][0] for args in mock_etl2.call_args_list]
+        self.assertEqual([first['name'], second['name']], ['first', 'again'])
+        self.assertEqual([first['vgraph'].name, second['vgraph'].name], ['first', 'again'])
+        self.assertNotIn('pointColor', first['encodings']['nodes'])
+        self.assertEqual(second['encodings']['nodes']['pointColor'], {'attributes': ['a1']})
+        self.assertEqual(first['vgraph'].SerializeToString().replace(b'first', b'again'),
+                         second['vgraph'].SerializeToString())
+
+    def test_data_changes(self, mock_etl2, mock_open):
+        edges = triangleEdges.copy()
+        plotter = graphistry.bind(source='src', destination='dst')
+        with patch.object(vgraph, 'create', wraps=vgraph.create) as mock_create:
+            plotter.plot(edges)
+            plotter.plot(edges.copy())
+            plotter.bind(source='dst', destination='src').plot(edges)
+            self.assertEqual(mock_create.call_count, 2)
+
+            edges['w'] = [100, 200, 300]
+            with patch.object(graphistry.util, 'warn') as mock_warn:
+                plotter.bind(edge_color='w').plot(edges)
+            self.assertFalse(mock_warn.called)
+            self.assertEqual(mock_create.call_count, 3)
+        dataset = mock_etl2.call_args[0][0]
+        self.assertEqual(dataset['attributes']['edges']['w']['aggregations']['max'], 300)
+
+    def test_dataset_copies(self, mock_etl2, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst')
+        first = plotter._plot_dispatch(triangleEdges, None, 'first', 'vgraph')
+        first['encodings'] = None
+        first['extra'] = True
+        second = plotter._plot_dispatch(triangleEdges, None, 'second', 'vgraph')
+        second['extra'] = False
+        third = plotter._plot_dispatch(triangleEdges, None, 'third', 'vgraph')
+        self.assertIs(third['vgraph']._chunks, first['vgraph']._chunks)
+        self.assertIsNotNone(third['encodings'])
+        self.assertNotIn('extra', third)
+
+    def test_memo_limits(self, mock_etl2, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst')
+        with patch.object(vgraph, 'create', wraps=vgraph.create) as mock_create:
+            with patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'plot_memo_max_size': 10}):
+                plotter.plot(triangleEdges)
+                plotter.plot(triangleEdges)
+            self.assertEqual(graphistry.pygraphistry.PyGraphistry._plot_datasets.size, 0)
+            graphistry.pygraphistry.PyGraphistry.plot_memo(False)
+            plotter.plot(triangleEdges)
+            plotter.plot(triangleEdges)
+            graphistry.pygraphistry.PyGraphistry.plot_memo(True)
+            self.assertEqual(mock_create.call_count, 4)
+
+
+class Fake_Error_Response(Fake_Response):
+    def json(self):
+        return {'success': False, 'msg': 'Unknown datasource'}
+
+
+# Response of a server supporting metadata-only updates
+class Fake_Reuse_Response(Fake_Response):
+    def json(self):
+        return dict(Fake_Response.json(self), reused='fakedatasetname')
+
+
+@patch('webbrowser.open')
+@patch.object(graphistry.util, 'warn')
+@patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'incremental_uploads': True})
+class TestIncrementalUploads(NoAuthTestCase):
+
+    def setUp(self):
+        graphistry.pygraphistry.PyGraphistry._plot_datasets = None
+        graphistry.pygraphistry.PyGraphistry._uploaded = None
+
+    def test_metadata_only(self, mock_warn, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst', node='id').nodes(triangleNodes)
+        with patch('requests.Session.post', return_value=Fake_Reuse_Response()) as mock_post:
+            plotter.plot(triangleEdges)
+            plotter.bind(point_color='a1').plot(triangleEdges)
+            plotter.plot(triangleEdges.copy())
+
+        (first, second, third) = [call[1]['data'].files for call in mock_post.call_args_list]
+        self.assertEqual(sorted(first.keys()), ['data0', 'metadata'])
+        self.assertEqual(list(second.keys()), ['metadata'])
+        self.assertEqual(list(third.keys()), ['metadata'])
+        metadata = json.loads(second['metadata'][1])
+        self.assertEqual(metadata['datasources'], [{'type': 'vgraph', 'dataset': 'fakedatasetname'}])
+        self.assertEqual(metadata['nodes'][0]['encodings']['pointColor'], {'attributes': ['a1']})
+        self.assertEqual(metadata['nodes'][0]['count'], 3)
+
+    def test_modified_data(self, mock_warn, mock_open):
+        edges = triangleEdges.copy()
+        plotter = graphistry.bind(source='src', destination='dst')
+        with patch('requests.Session.post', return_value=Fake_Reuse_Response()) as mock_post:
+            plotter.plot(edges)
+            edges['w'] = [100, 200, 300]
+            plotter.bind(edge_color='w').plot(edges)
+        self.assertEqual([sorted(call[1]['data'].files.keys()) for call in mock_post.call_args_list],
+                         [['data0', 'metadata'], ['data0', 'metadata']])
+        self.assertFalse(mock_warn.called)
+
+    def test_without_memo(self, mock_warn, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst')
+        with patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'plot_memo': False}):
+            with patch('requests.Session.post', return_value=Fake_Reuse_Response()) as mock_post:
+                plotter.plot(triangleEdges)
+                plotter.bind(edge_title='src').plot(triangleEdges)
+        self.assertEqual([sorted(call[1]['data'].files.keys()) for call in mock_post.call_args_list],
+                         [['data0', 'metadata'], ['metadata']])
+
+    def test_fallback(self, mock_warn, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst')
+        responses = [Fake_Reuse_Response(), Fake_Error_Response(), Fake_Reuse_Response()]
+        with patch('requests.Session.post', side_effect=responses) as mock_post:
+            plotter.plot(triangleEdges)
+            url = plotter.bind(edge_title='src').plot(triangleEdges)
+        self.assertIn('fakedatasetname', url)
+        self.assertEqual([sorted(call[1]['data'].files.keys()) for call in mock_post.call_args_list],
+                         [['data0', 'metadata'], ['metadata'], ['data0', 'metadata']])
+        self.assertTrue(mock_warn.called)
+
+    def test_unconfirmed_reuse(self, mock_warn, mock_open):
+        plotter = graphistry.bind(source='src', destination='dst')
+        with patch('requests.Session.post', return_value=Fake_Response()) as mock_post:
+            plotter.plot(triangleEdges)
+            plotter.bind(edge_title='src').plot(triangleEdges)
+        self.assertEqual([sorted(call[1]['data'].files.keys()) for call in mock_post.call_args_list],
+                         [['data0', 'metadata'], ['metadata'], ['data0', 'metadata']])
+        self.assertTrue(mock_warn.called)
+
+
 class TestPlotterConversions(NoAuthTestCase):
 
     def test_igraph2pandas(self):
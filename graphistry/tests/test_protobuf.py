@@ -4,8 +4,14 @@ import unittest
 import pandas
 import numpy
 import datetime
+import gzip
+import io
+import requests
+import urllib3
 import graphistry
 import graphistry.plotter
+from graphistry import vgraph
+from graphistry import graph_vector_pb2
 from mock import patch
 from common import NoAuthTestCase
 
@@ -96,3 +102,184 @@ class TestEtl2Unicode(NoAuthTestCase):
 
         graphistry.bind(source='src', destination='dst').plot(edges)
         self.assertTrue(mock_etl2.called)
+
+
+class TestMultipartBody(unittest.TestCase):
+
+    def make_body(self):
+        data = io.BytesIO(b'skipped' + b'payload' * 1000)
+        data.seek(7)
+        files = {'metadata': ('metadata', u'{"name": "tést"}', 'application/json'),
+                 'data0': ('data0', data, 'application/octet-stream')}
+        return graphistry.util.MultipartBody(files)
+
+    def test_same_as_requests(self):
+        body = self.make_body()
+        fields = {'metadata': ('metadata', u'{"name": "tést"}'.encode('utf8'), 'application/json'),
+                  'data0': ('data0', b'payload' * 1000, 'application/octet-stream')}
+        (expected, content_type) = urllib3.filepost.encode_multipart_formdata(fields, boundary=body.boundary)
+        self.assertEqual(body.content_type, content_type)
+        self.assertEqual(len(body), len(expected))
+        self.assertEqual(b''.join(body), expected)
+
+        body.seek(100)
+        blocks = [body.read(33) for _ in range(10)]
+        self.assertEqual(b''.join(blocks), expected[100:430])
+        self.assertEqual(body.tell(), 430)
+
+    def test_streamed_by_requests(self):
+        body = self.make_body()
+        request = requests.Request('POST', 'http://localhost/etl', data=body,
+                                   headers={'Content-Type': body.content_type}).prepare()
+        self.assertIs(request.body, body)
+        self.assertEqual(request.headers['Content-Length'], str(len(body)))
+        self.assertNotIn('Transfer-Encoding', request.headers)
+
+    def test_spooled_file(self):
+        import tempfile
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+        spooled.write(b'payload')
+        spooled.seek(0)
+        body = graphistry.util.StreamedBody([spooled])
+        request = requests.Request('POST', 'http://localhost/etl', data=body).prepare()
+        self.assertEqual(request.headers['Content-Length'], '7')
+        self.assertFalse(spooled._rolled)
+        self.assertEqual(b''.join(body), b'payload')
+
+
+class TestVGraphEdges(unittest.TestCase):
+
+    def test_varints(self):
+        for value in [0, 1, 127, 128, 300, 2**32 - 1, -1]:
+            vec = graph_vector_pb2.VectorGraph.Int64AttributeVector()
+            vec.values.append(value)
+            (block, lengths) = vgraph.varintBlock([value])
+            self.assertEqual(block[0][:lengths[0]].tobytes(), vec.SerializePartialToString()[2:])
+
+    def test_edges(self):
+        vg = graph_vector_pb2.VectorGraph()
+        vgraph.addEdges(vg, numpy.array([0, 1, 200]), numpy.array([1, 200, 0]))
+        self.assertEqual([(e.src, e.dst) for e in vg.edges], [(0, 1), (1, 200), (200, 0)])
+
+
+class TestVGraphValues(unittest.TestCase):
+
+    def test_packed_values(self):
+        vg = graph_vector_pb2.VectorGraph()
+        cases = [
+            (vg.int32_vectors, 'int32', [0, -1, 300, 2**31 - 1]),
+            (vg.int64_vectors, 'int64', [0, -2**40, 2**40]),
+            (vg.float_vectors, 'float32', [0.5, -1.25, 3.0]),
+            (vg.double_vectors, 'float64', [0.1, -1e300, 3.0]),
+            (vg.bool_vectors, 'bool', [True, False, True])
+        ]
+        for (vectors, ctype, values) in cases:
+            vec = vectors.add()
+            vgraph.mergeValues(vec, numpy.array(values), ctype)
+            self.assertEqual(list(vec.values), values)
+
+
+class TestVGraphSparse(unittest.TestCase):
+
+    def make_datasets(self, direct):
+        nodes = pandas.DataFrame({
+            'id': ['c', 'a', 'b', 'd'],
+            's': [None, u'♜ x', 'b', None], 'z': [None, None, None, '\0'], 'e': [None] * 4,
+            'f': [1.5, None, None, 2.5]
+        })
+        sparse = nodes.copy()
+        for col in ['s', 'z', 'e', 'f']:
+            sparse[col] = nodes[col].astype(pandas.SparseDtype(nodes[col].dtype, numpy.nan))
+        node_index = pandas.Index(['a', 'b', 'c', 'd'], name='id')
+        edges = pandas.DataFrame({'w': pandas.arrays.SparseArray([None, 'x', None], dtype=pandas.SparseDtype(object, numpy.nan))})
+        return [vgraph.create(edges, df, numpy.array([0, 1, 2]), numpy.array([1, 2, 3]), 'id', node_index, 'sparse', direct=direct)
+                for df in [nodes, sparse]]
+
+    def test_same_as_dense(self):
+        for direct in [False, True]:
+            (dense, sparse) = self.make_datasets(direct)
+            self.assertEqual(sparse['vgraph'].SerializeToString(), dense['vgraph'].SerializeToString())
+            self.assertEqual(sparse['attributes'], dense['attributes'])
+
+    def test_strings(self):
+        vg = self.make_datasets(True)[1]['vgraph'].toProtobuf()
+        strings = dict((v.name, list(v.values)) for v in vg.string_vectors)
+        self.assertEqual(strings['s'], [u'♜ x', 'b', u'\0', u'\0'])
+        self.assertEqual(strings['e'], [u'\0'] * 4)
+        self.assertEqual(strings['w'], [u'\0', 'x', u'\0'])
+        self.assertEqual(vgraph.encodeSparseStrings(vgraph.VALUES_TAG, 0, [], [], '\0'), b'')
+
+
+class TestVGraphWriter(unittest.TestCase):
+
+    def make_dataset(self, direct):
+        edges = pandas.DataFrame({
+            'i': [1, -2, 3], 'big': [0, 2**40, 5], 'f': [0.5, numpy.nan, 1.5],
+            'f32': numpy.array([0.5, 1, 2], dtype='float32'), 'b': [True, False, True],
+            'd': pandas.to_datetime(['2017-01-01', None, '2018-01-01']),
+            'ustring': [u'abcdef', None, u'♜ ♞ ♝ ♛ ♚ ♝ ♞ ♜']
+        })
+        nodes = pandas.DataFrame({'id': ['c', 'a', 'b'], 'a1': [3, 1, 2], 'a2': ['green', 'red', 'blue']})
+        node_index = pandas.Index(['a', 'b', 'c'], name='id')
+        return vgraph.create(edges, nodes, numpy.array([0, 1, 2]), numpy.array([1, 2, 0]),
+                             'id', node_index, u'tést', direct=direct)
+
+    def test_byte_compatible(self):
+        expected = self.make_dataset(False)
+        written = self.make_dataset(True)
+        self.assertEqual(written['vgraph'].SerializeToString(), expected['vgraph'].SerializeToString())
+        self.assertEqual(written['attributes'], expected['attributes'])
+        with patch.object(vgraph, 'batch_size', 2):
+            self.assertEqual(written['vgraph'].SerializeToString(), expected['vgraph'].SerializeToString())
+
+    def test_roundtrip(self):
+        vg = graph_vector_pb2.VectorGraph()
+        vg.ParseFromString(self.make_dataset(True)['vgraph'].SerializeToString())
+        self.assertEqual((vg.vertexCount, vg.edgeCount, vg.name), (3, 3, u'tést'))
+        self.assertEqual([(e.src, e.dst) for e in vg.edges], [(0, 1), (1, 2), (2, 0)])
+        strings = dict((v.name, list(v.values)) for v in vg.string_vectors)
+        self.assertEqual(strings['a2'], ['red', 'blue', 'green'])
+        self.assertEqual(strings['ustring'], [u'abcdef', u'\0', u'♜ ♞ ♝ ♛ ♚ ♝ ♞ ♜'])
+        ints = dict((v.name, list(v.values)) for v in vg.int32_vectors)
+        self.assertEqual(ints['a1'], [1, 2, 3])
+        self.assertEqual(ints['i'], [1, -2, 3])
+
+    def test_mixed_objects(self):
+        edges = pandas.DataFrame({'m': [1, u'b', None]})
+        ds = vgraph.create(edges, pandas.DataFrame({'id': ['a', 'b', 'c']}), numpy.array([0, 1, 2]),
+                           numpy.array([1, 2, 0]), 'id', pandas.Index(['a', 'b', 'c'], name='id'), 'n', direct=True)
+        aggregations = ds['attributes']['edges']['m']['aggregations']
+        self.assertEqual((aggregations['min'], aggregations['max']), (u'\0', u'b'))
+
+    def test_skip_upload(self):
+        edges = pandas.DataFrame({'s': ['a', 'b'], 'd': ['b', 'a'], 'w': [u'x', None]})
+        with patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'api_version': 2}):
+            ds = graphistry.bind(source='s', destination='d').plot(edges, skip_upload=True)
+        self.assertIsInstance(ds['vgraph'], graph_vector_pb2.VectorGraph)
+        self.assertEqual([(e.src, e.dst) for e in ds['vgraph'].edges], [(0, 1), (1, 0)])
+        self.assertEqual(list(ds['vgraph'].string_vectors[0].values), [u'x', u'\0'])
+
+    @patch.object(graphistry.pygraphistry.PyGraphistry, '_spool_max_size', 16)
+    def test_streamed_data_file(self):
+        vg = self.make_dataset(True)['vgraph']
+        for level in [6, 'auto']:
+            with patch.dict(graphistry.pygraphistry.PyGraphistry._config, {'compression_level': level}), \
+                 graphistry.pygraphistry.PyGraphistry._get_data_file(vg, 'vgraph') as out_file:
+                self.assertTrue(out_file._rolled)
+                self.assertEqual(gzip.GzipFile(fileobj=out_file, mode='rb').read(), vg.SerializeToString())
+
+    def test_deferred_encoding(self):
+        with patch.object(vgraph, 'encodeValues', wraps=vgraph.encodeValues) as mock_values, \
+             patch.object(vgraph, 'encodeStringValues', wraps=vgraph.encodeStringValues) as mock_strings:
+            vg = self.make_dataset(True)['vgraph']
+            self.assertEqual((mock_values.call_count, mock_strings.call_count), (0, 0))
+            pieces = vg.iterSerialized()
+            next(pieces)
+            next(pieces)
+            self.assertEqual((mock_values.call_count, mock_strings.call_count), (0, 0))
+            list(pieces)
+            self.assertEqual((mock_values.call_count, mock_strings.call_count), (7, 3))
+
+        expected = vg.SerializeToString()
+        vg.encodeDeferred()
+        self.assertEqual(vg.SerializeToString(), expected)
@@ -3,6 +3,9 @@ from past.builtins import cmp
 from builtins import str
 from builtins import range
 
+import binascii
+import io
+import os
 import sys
 import platform as p
 import uuid
@@ -85,4 +88,87 @@ def error(msg):
 def merge_two_dicts(a, b):
     c = a.copy()
     c.update(b)
-    return c
\ No newline at end of file
+    return c
+
+
+# Request body made of seekable streams, sent one after the other from their current position.
+# Given such a body, requests sends it in blocks (with a Content-Length header) instead of
+# reading it whole. Unlike the streams themselves, it has no fileno(), which requests would
+# call to find out the size, forcing eg. spooled temporary files onto disk.
+class StreamedBody(object):
+
+    block_size = 1024 * 1024
+
+    def __init__(self, streams):
+        self._streams = []
+        for stream in streams:
+            self._add(stream)
+        self._size = sum(size for (_, _, size) in self._streams)
+        self.seek(0)
+
+    # Record a stream as (stream, start position, size), from its current position to its end.
+    def _add(self, stream):
+        start = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        self._streams.append((stream, start, stream.tell() - start))
+
+    def read(self, size=-1):
+        out = []
+        while self._index < len(self._streams) and size != 0:
+            (stream, start, length) = self._streams[self._index]
+            data = stream.read(size)
+            if not data:
+                self._index += 1
+                continue
+            out.append(data)
+            self._position += len(data)
+            if size > 0:
+                size -= len(data)
+        return b''.join(out)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET:
+            raise ValueError('Multipart bodies only seek to absolute positions')
+        self._position = min(max(offset, 0), self._size)
+        self._index = len(self._streams)
+        base = 0
+        for (i, (stream, start, length)) in enumerate(self._streams):
+            stream.seek(start + min(max(self._position - base, 0), length))
+            if self._position < base + length:
+                self._index = min(self._index, i)
+            base += length
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        block = self.read(StreamedBody.block_size)
+        while block:
+            yield block
+            block = self.read(StreamedBody.block_size)
+
+
+# Streamed multipart/form-data request body. Parts are given like the files= argument of
+# requests, as {name: (filename, content, content type)}, where content is a string or a
+# seekable file object. Unlike with files=, the body is not built in memory first.
+class MultipartBody(StreamedBody):
+
+    def __init__(self, files):
+        self.files = files
+        self.boundary = binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        streams = []
+        for (name, (filename, content, content_type)) in files.items():
+            header = '--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\nContent-Type: %s\r\n\r\n' \
+                % (self.boundary, name, filename, content_type)
+            streams.append(io.BytesIO(header.encode('utf8')))
+            if isinstance(content, str):
+                content = content.encode('utf8')
+            streams.append(io.BytesIO(content) if isinstance(content, bytes) else content)
+            streams.append(io.BytesIO(b'\r\n'))
+        streams.append(io.BytesIO(('--%s--\r\n' % self.boundary).encode('ascii')))
+        super(MultipartBody, self).__init__(streams)
@@ -1,7 +1,6 @@
 from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
-from builtins import zip
 from builtins import next
 from builtins import str
 
@@ -22,23 +21,25 @@ VERTEX = graph_vector_pb2.VectorGraph.VERTEX
 # Creates the ETL2 protobuf vgraph from
 #  - edge_df: the edge dataframe
 #  - node_df: the node dataframe
-#  - sources: a series of edge sources
-#  - dests: a series of edge destinations
+#  - sources: an array of edge sources, as dense integer ids in [0, #nodes -1]
+#  - dests: an array of edge destinations, as dense integer ids in [0, #nodes -1]
 #  - nodeid: The name of the nodeId column in node_df
-#  - node_map: A map from nodeId to a dense integer range [0, #nodes -1]
+#  - node_index: An index of nodeIds, where the position of a nodeId is its dense integer id
 #  - name: The name of the dataset.
-def create(edge_df, node_df, sources, dests, nodeid, node_map, name):
-    vg = graph_vector_pb2.VectorGraph()
+#  - direct: Whether to write the wire format directly with a VectorGraphWriter
+#            instead of building a graph_vector_pb2.VectorGraph message.
+def create(edge_df, node_df, sources, dests, nodeid, node_index, name, direct=False):
+    vg = VectorGraphWriter() if direct else graph_vector_pb2.VectorGraph()
     vg.version = 1
     vg.type = VectorGraph.DIRECTED
-    vg.vertexCount = len(node_map)
+    vg.vertexCount = len(node_index)
     vg.edgeCount = len(edge_df)
     if name is not None:
         vg.name = name
 
-    addEdges(vg, sources, dests, node_map)
+    addEdges(vg, sources, dests)
     edge_types = storeEdgeAttributes(vg, edge_df)
-    node_types = storeNodeAttributes(vg, node_df, nodeid, node_map)
+    node_types = storeNodeAttributes(vg, node_df, nodeid, node_index)
 
     return  {
         'name': name,
@@ -51,18 +52,197 @@ def create(edge_df, node_df, sources, dests, nodeid, node_map, name):
 
 
 # Encode edges into protobuf using source/dest pairs in [0, #nodes-1] range.
-def addEdges(vg, sources, dests, node_map):
-    for s, d in zip(sources.tolist(), dests.tolist()):
-        e = vg.edges.add()
-        e.src = node_map[s]
-        e.dst = node_map[d]
+# The whole edge list is handed to protobuf as one pre-encoded wire-format block.
+def addEdges(vg, sources, dests):
+    mergeEncoded(vg, encodeEdges, sources, dests)
+
+
+# Append the fields encoded by encode(*args) to a message. Writers defer the encoding until
+# they are serialized, while protobuf messages parse the fields right away.
+def mergeEncoded(message, encode, *args):
+    if isinstance(message, (VectorGraphWriter, AttributeVectorWriter)):
+        message.MergeDeferred(encode, args)
+    else:
+        message.MergeFromString(encode(*args))
+
+
+# Protobuf wire-format helpers. They encode whole numpy columns at once, so the
+# cost of building large payloads does not depend on per-value interpreter work.
+EDGES_TAG = 0x32 # VectorGraph.edges: field 6, length-delimited
+EDGE_SRC_TAG = 0x08 # VectorGraph.Edge.src: field 1, varint
+EDGE_DST_TAG = 0x10 # VectorGraph.Edge.dst: field 2, varint
+VALUES_TAG = 0x1a # <Type>AttributeVector.values: field 3, length-delimited (packed)
+
+# Number of values encoded at once, which bounds the size of the temporary arrays of the
+# encoders to a few MB whatever the size of the column.
+batch_size = 64 * 1024
+
+
+# Encode the rows of columns (arrays of the same length) batch by batch with encode, and
+# concatenate the results.
+def encodeBatches(encode, *columns):
+    count = len(columns[0])
+    if count <= batch_size:
+        return encode(*columns)
+    return b''.join(encode(*[column[i:i + batch_size] for column in columns]) for i in range(0, count, batch_size))
+
+
+# Returns an (N, width) uint8 array holding the varint encoding of each value
+# (left aligned), as well as the number of bytes used by each row.
+def varintBlock(values):
+    # Negative integers are sign-extended to 64 bits, as protobuf does for int32/int64.
+    values = numpy.asarray(values).astype(numpy.int64).astype(numpy.uint64)
+    lengths = numpy.ones(len(values), dtype=numpy.int64)
+    for shift in range(7, 64, 7):
+        lengths += (values >> numpy.uint64(shift)) > 0
+    width = lengths.max() if len(values) else 1
+    shifts = numpy.arange(width, dtype=numpy.uint64) * numpy.uint64(7)
+    block = ((values[:, None] >> shifts) & numpy.uint64(0x7F)).astype(numpy.uint8)
+    block[numpy.arange(width) < lengths[:, None] - 1] |= 0x80
+    return (block, lengths)
+
+
+# Returns a block where every row is the same single byte.
+def constantBlock(byte, count):
+    return (numpy.full((count, 1), byte, dtype=numpy.uint8), numpy.ones(count, dtype=numpy.int64))
+
+
+# Concatenates blocks row by row, keeping only the used bytes of each row.
+def joinBlocks(blocks):
+    data = numpy.hstack([block for (block, _) in blocks])
+    mask = numpy.hstack([numpy.arange(block.shape[1]) < lengths[:, None] for (block, lengths) in blocks])
+    return data[mask].tobytes()
+
+
+def encodeVarint(value):
+    return joinBlocks([varintBlock([value])])
+
+
+# Encode a length-delimited field: tag, byte size, then the payload itself.
+def encodeDelimited(tag, payload):
+    return bytes(bytearray([tag])) + encodeVarint(len(payload)) + payload
+
+
+# Serialize a repeated string field (one length-delimited entry per value).
+def encodeStrings(tag, values):
+    return encodeBatches(lambda batch: stringRows(tag, batch)[0].tobytes(), values)
+
+
+# Returns the encoding of a repeated string field as a uint8 array, along with the number
+# of bytes of each entry.
+def stringRows(tag, values):
+    encoded = [v.encode('utf8') for v in values]
+    if len(encoded) == 0:
+        return (numpy.empty(0, dtype=numpy.uint8), numpy.empty(0, dtype=numpy.int64))
+    sizes = numpy.array([len(b) for b in encoded], dtype=numpy.int64)
+    (size_block, size_lengths) = varintBlock(sizes)
+    prefixes = numpy.frombuffer(joinBlocks([constantBlock(tag, len(sizes)), (size_block, size_lengths)]), dtype=numpy.uint8)
+    prefix_lengths = 1 + size_lengths
+
+    # Scatter the tag/size prefixes in front of each value, then fill the gaps with the utf8 bytes.
+    row_lengths = prefix_lengths + sizes
+    row_starts = numpy.cumsum(row_lengths) - row_lengths
+    prefix_starts = numpy.cumsum(prefix_lengths) - prefix_lengths
+    prefix_pos = numpy.repeat(row_starts - prefix_starts, prefix_lengths) + numpy.arange(len(prefixes))
+    out = numpy.empty(row_lengths.sum(), dtype=numpy.uint8)
+    is_value = numpy.ones(len(out), dtype=numpy.bool_)
+    is_value[prefix_pos] = False
+    out[prefix_pos] = prefixes
+    out[is_value] = numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+    return (out, row_lengths)
+
+
+# Serialize a repeated string field of count entries, where the entries at the (sorted)
+# positions indices hold values, and all the others hold fill. Only the values are encoded
+# one by one: the fill entries are copied in as a block.
+def encodeSparseStrings(tag, count, indices, values, fill):
+    if count == 0:
+        return b''
+    (present, present_lengths) = stringRows(tag, values)
+    (filler, filler_lengths) = stringRows(tag, [fill])
+    is_present = numpy.zeros(count, dtype=numpy.bool_)
+    is_present[indices] = True
+    row_lengths = numpy.full(count, filler_lengths[0], dtype=numpy.int64)
+    row_lengths[is_present] = present_lengths
+
+    present_bytes = numpy.repeat(is_present, row_lengths)
+    out = numpy.empty(len(present_bytes), dtype=numpy.uint8)
+    out[present_bytes] = present
+    out[~present_bytes] = numpy.tile(filler, count - len(values))
+    return out.tobytes()
+
+
+# Serialize the repeated VectorGraph.edges field given dense src/dst id arrays.
+def encodeEdges(src, dst):
+    return encodeBatches(encodeEdgeBatch, numpy.asarray(src), numpy.asarray(dst))
+
+
+def encodeEdgeBatch(src, dst):
+    count = len(src)
+    if count == 0:
+        return b''
+    src_block = varintBlock(src)
+    dst_block = varintBlock(dst)
+    # An Edge is at most 12 bytes long, so its size always fits in a one byte varint.
+    size = 2 + src_block[1] + dst_block[1]
+    return joinBlocks([
+        constantBlock(EDGES_TAG, count),
+        (size.astype(numpy.uint8)[:, None], numpy.ones(count, dtype=numpy.int64)),
+        constantBlock(EDGE_SRC_TAG, count),
+        src_block,
+        constantBlock(EDGE_DST_TAG, count),
+        dst_block
+    ])
+
+
+# Encode the payload of a packed values field, where ctype is the protobuf
+# representation of the attribute vector (see numericEncoder's typemap).
+def packValues(values, ctype):
+    values = numpy.asarray(values)
+    if ctype in ('float16', 'float32'):
+        return values.astype('<f4').tobytes()
+    elif ctype == 'float64':
+        return values.astype('<f8').tobytes()
+    elif ctype == 'bool':
+        return values.astype(numpy.bool_).astype(numpy.uint8).tobytes()
+    else:
+        return encodeBatches(lambda batch: joinBlocks([varintBlock(batch)]), values) if len(values) else b''
+
+
+# Append a whole column of values to an attribute vector with a single call.
+def mergeValues(vec, values, ctype):
+    mergeEncoded(vec, encodeValues, values, ctype)
+
+
+# Serialize the packed values field of an attribute vector.
+def encodeValues(values, ctype):
+    payload = packValues(values, ctype)
+    return encodeDelimited(VALUES_TAG, payload) if len(payload) > 0 else b''
+
+
+# Serialize the values field of a string attribute vector.
+def encodeStringValues(series):
+    return encodeBatches(lambda batch: encodeStrings(VALUES_TAG, pandas.Series(batch).astype('unicode').tolist()),
+                         series.values)
+
+
+# Columns of df as (dtype, columns) pairs: the columns grouped by dtype, then each sparse
+# column on its own, as sparse dtypes cannot be ordered along with the others.
+def columnsByType(df):
+    is_sparse = df.dtypes.map(isSparse).values.astype(numpy.bool_)
+    dense = df.dtypes[~is_sparse]
+    groups = list(dense.index.to_series().groupby(dense).groups.items())
+    return groups + [(dtype, [col]) for (col, dtype) in df.dtypes[is_sparse].items()]
+
+
+def isSparse(dtype):
+    return isinstance(dtype, getattr(pandas, 'SparseDtype', ()))
 
 
 def storeEdgeAttributes(vg, df):
     edge_types = {}
 
-    coltypes = df.columns.to_series().groupby(df.dtypes)
-    for dtype, cols in list(coltypes.groups.items()):
+    for dtype, cols in columnsByType(df):
         for col in cols:
             enc_type = storeValueVector(vg, df, col, dtype, EDGE)
             edge_types[col] = enc_type
@@ -70,17 +250,15 @@ def storeEdgeAttributes(vg, df):
     return edge_types
 
 
-def storeNodeAttributes(vg, df, nodeid, node_map):
-    ordercol = '__order__'
+def storeNodeAttributes(vg, df, nodeid, node_index):
     node_types = {}
 
     # Sort values of node attributes based on assigned id in [0, #nodes-1] range
-    df[ordercol] = df[nodeid].map(lambda n: node_map[n])
-    df.sort_values(ordercol, inplace=True)
-    df.drop(ordercol, axis=1, inplace=True)
-    coltypes = df.columns.to_series().groupby(df.dtypes)
+    order = node_index.get_indexer(df[nodeid])
+    if not (numpy.diff(order) > 0).all():
+        df = df.iloc[numpy.argsort(order, kind='mergesort')]
 
-    for dtype, cols in list(coltypes.groups.items()):
+    for dtype, cols in columnsByType(df):
         for col in cols:
             enc_type = storeValueVector(vg, df, col, dtype, VERTEX)
             node_types[col] = enc_type
@@ -108,6 +286,16 @@ def storeValueVector(vg, df, col, dtype, target):
         'datetime64[ns]': datetimeEncoder,
     }
     df_col = df[col]
+    if isSparse(dtype):
+        if dtype.subtype == numpy.object_ and pandas.isnull(dtype.fill_value):
+            return sparseObjectVector(vg, df_col, col, target)
+        df_col = df_col.sparse.to_dense()
+        dtype = df_col.dtype
+    if dtype.name == 'object':
+        # Strings are encoded, and counted, with NAs as '\0'. Replace them in a copy,
+        # as the dataframe may belong to the caller.
+        df_col = df_col.copy()
+        df_col.where(pandas.notnull(df_col), '\0', inplace=True)
     (vec, info) = encoders[dtype.name](vg, df_col, dtype)
     vec.name = str(col)
     vec.target = target
@@ -120,24 +308,63 @@ def storeValueVector(vg, df, col, dtype, target):
         aggregations['missing'] = nanGuard(df_col.size - aggregations['valid'])
     if 'distinct' not in aggregations:
         aggregations['distinct'] = nanGuard(df_col.nunique())
-    if 'min' not in aggregations:
-        aggregations['min'] = nanGuard(df_col.min())
-    if 'max' not in aggregations:
-        aggregations['max'] = nanGuard(df_col.max())
+    if 'min' not in aggregations or 'max' not in aggregations:
+        (low, high) = bounds(df_col)
+        aggregations.setdefault('min', nanGuard(low))
+        aggregations.setdefault('max', nanGuard(high))
 
     return info
 
 
+# Min and max of a column. Objects that cannot be compared with each other (eg. hypergraph
+# titles mixing numbers and strings) are compared as the strings they are encoded as.
+def bounds(series):
+    try:
+        return (series.min(), series.max())
+    except TypeError:
+        strings = series.astype('unicode')
+        return (strings.min(), strings.max())
+
+
 # returns tuple() of StringAttributeVector and object with type info.
 def objectEncoder(vg, series, dtype):
-    series.where(pandas.notnull(series), '\0', inplace=True)
     # vec is a string[] submessage within a repeated
     vec = vg.string_vectors.add()
-    for val in series.astype('unicode'):
-        vec.values.append(val)
+    mergeEncoded(vec, encodeStringValues, series)
     return (vec, {'ctype': 'utf8'})
 
 
+# Same as storeValueVector for a sparse object column with NaN as fill value, without
+# materializing the '\0' it stands for in every missing cell: only the values present
+# are converted and encoded, and the aggregations are computed as if the column was padded.
+def sparseObjectVector(vg, series, col, target):
+    sparse = series.array
+    present = pandas.notnull(sparse.sp_values)
+    values = pandas.Series(sparse.sp_values[present])
+    indices = sparse.sp_index.to_int_index().indices[present]
+    padded = len(values) < len(series)
+
+    vec = vg.string_vectors.add()
+    mergeEncoded(vec, encodeSparseStrings, VALUES_TAG, len(series), indices, values.astype('unicode'), '\0')
+    vec.name = str(col)
+    vec.target = target
+
+    distinct = values.nunique()
+    if padded and not (values == '\0').any():
+        distinct += 1
+    bounds = pandas.Series(([values.min(), values.max()] if len(values) else []) + (['\0'] if padded else []), dtype=object)
+    return {
+        'ctype': 'utf8',
+        'aggregations': {
+            'valid': len(series),
+            'missing': 0,
+            'distinct': nanGuard(distinct),
+            'min': nanGuard(bounds.min()),
+            'max': nanGuard(bounds.max())
+        }
+    }
+
+
 # NaN (as well as Infinity and undefined) are valid JSON. Use this guard to filter
 # them out when creating the json metadata.
 def nanGuard(value):
@@ -173,8 +400,7 @@ def numericEncoder(vg, series, dtype):
         rep_type = dtype
 
     vec = typemap[rep_type.name].add()
-    for val in series:
-        vec.values.append(val)
+    mergeValues(vec, series.values, rep_type.name)
 
     variance = series.var()
     stddev = series.std()
@@ -192,8 +418,7 @@ def numericEncoder(vg, series, dtype):
 
 def boolEncoder(vg, series, dtype):
     vec = vg.bool_vectors.add()
-    for val in series:
-        vec.values.append(True if val else False)
+    mergeValues(vec, series.values, 'bool')
     return (vec, {
         'ctype': 'bool'
     })
@@ -201,9 +426,8 @@ def boolEncoder(vg, series, dtype):
 
 def datetimeEncoder(vg, series, dtype):
     vec = vg.int32_vectors.add()
-    series32 = series.astype('int64').map(lambda x: x / 1e9).astype(numpy.int32)
-    for val in series32:
-        vec.values.append(val)
+    series32 = (series.astype('int64') / 1e9).astype(numpy.int32)
+    mergeValues(vec, series32.values, 'int32')
 
     info = {
         'ctype': 'datetime32[s]',
@@ -215,3 +439,124 @@ def datetimeEncoder(vg, series, dtype):
         }
     }
     return (vec, info)
+
+
+# Writes the VectorGraph wire format straight from numpy arrays, without going through
+# the protobuf runtime. It mirrors the parts of the graph_vector_pb2.VectorGraph API used
+# in this module, so every encoder above can target either one. Fields are kept as byte
+# chunks, or as (encode, args) to be encoded when serialized, and SerializeToString()
+# produces the same bytes as the protobuf message.
+class VectorGraphWriter(object):
+
+    # Field numbers of the repeated attribute vectors in VectorGraph.
+    vector_fields = [
+        ('uint32_vectors', 7),
+        ('double_vectors', 8),
+        ('string_vectors', 9),
+        ('int32_vectors', 10),
+        ('int64_vectors', 11),
+        ('float_vectors', 12),
+        ('bool_vectors', 13)
+    ]
+
+    def __init__(self):
+        self.version = 0
+        self.name = None
+        self.type = VectorGraph.UNDIRECTED
+        self.vertexCount = 0
+        self.edgeCount = 0
+        self._chunks = []
+        for (attr, field) in VectorGraphWriter.vector_fields:
+            setattr(self, attr, AttributeVectorWriters(field))
+
+    # Append pre-encoded fields. As the writer does not reorder chunks, they must belong
+    # between the header fields and the attribute vectors (ie. VectorGraph.edges).
+    def MergeFromString(self, data):
+        self._chunks.append(data)
+
+    # Append fields to encode when serialized, with encode(*args), under the same constraints.
+    def MergeDeferred(self, encode, args):
+        self._chunks.append((encode, args))
+
+    # Encode the deferred fields now, eg. before sending the writer to another process.
+    def encodeDeferred(self):
+        self._chunks = [encodeChunk(chunk) for chunk in self._chunks]
+        for (attr, _) in VectorGraphWriter.vector_fields:
+            for vec in getattr(self, attr):
+                vec._chunks = [encodeChunk(chunk) for chunk in vec._chunks]
+
+    # Yield the serialized message piece by piece, in field number order. Deferred fields
+    # are encoded on the way, so only the bytes of one of them are held at a time.
+    def iterSerialized(self):
+        header = [bytes(bytearray([0x08])) + encodeVarint(self.version)]
+        if self.name is not None:
+            header.append(encodeDelimited(0x12, self.name.encode('utf8')))
+        header.append(bytes(bytearray([0x18])) + encodeVarint(self.type))
+        header.append(bytes(bytearray([0x20])) + encodeVarint(self.vertexCount))
+        header.append(bytes(bytearray([0x28])) + encodeVarint(self.edgeCount))
+        yield b''.join(header)
+
+        for chunk in self._chunks:
+            yield encodeChunk(chunk)
+        for (attr, field) in VectorGraphWriter.vector_fields:
+            for vec in getattr(self, attr):
+                for chunk in vec.iterSerialized():
+                    yield chunk
+
+    def SerializeToString(self):
+        return b''.join(self.iterSerialized())
+
+    # Parse the written bytes back into a regular protobuf message.
+    def toProtobuf(self):
+        vg = graph_vector_pb2.VectorGraph()
+        vg.ParseFromString(self.SerializeToString())
+        return vg
+
+
+# Repeated field of attribute vectors, with protobuf's add() semantics.
+class AttributeVectorWriters(list):
+
+    def __init__(self, field):
+        super(AttributeVectorWriters, self).__init__()
+        self.field = field
+
+    def add(self):
+        vec = AttributeVectorWriter(self.field)
+        self.append(vec)
+        return vec
+
+
+class AttributeVectorWriter(object):
+
+    def __init__(self, field):
+        self.field = field
+        self.name = ''
+        self.target = VERTEX
+        self._chunks = []
+
+    # Append pre-encoded values fields (see mergeValues).
+    def MergeFromString(self, data):
+        self._chunks.append(data)
+
+    def MergeDeferred(self, encode, args):
+        self._chunks.append((encode, args))
+
+    # Yield the vector as one length-delimited VectorGraph field, without joining its values.
+    # Deferred values are encoded first, as the size of the field precedes them.
+    def iterSerialized(self):
+        chunks = [encodeChunk(chunk) for chunk in self._chunks]
+        header = encodeDelimited(0x0a, self.name.encode('utf8')) \
+               + bytes(bytearray([0x10])) + encodeVarint(self.target)
+        size = len(header) + sum(len(chunk) for chunk in chunks)
+        yield bytes(bytearray([(self.field << 3) | 2])) + encodeVarint(size) + header
+        for chunk in chunks:
+            yield chunk
+
+
+# Bytes of a chunk of a writer, encoding it if deferred.
+def encodeChunk(chunk):
+    if isinstance(chunk, tuple):
+        (encode, args) = chunk
+        return encode(*args)
+    return chunk
+
@@ -45,7 +45,8 @@ setup(
     author='The Graphistry Team',
     author_email='pygraphistry@graphistry.com',
     setup_requires=['numpy', 'pytest-runner'],
-    install_requires=['numpy', 'pandas >= 0.17.0', 'requests', 'future >= 0.15.0', 'protobuf >= 2.6.0'],
+    install_requires=['numpy', 'pandas >= 0.17.0', 'requests', 'future >= 0.15.0', 'protobuf >= 2.6.0',
+                      'futures; python_version < "3.0"'],
     extras_require={
         'igraph': ['python-igraph'],
         'networkx': ['networkx'],